@@ -4,75 +4,291 @@ Tracks working hours for team members with hourly check-ins and daily reports
 """
 
 import os
+import atexit
+import concurrent.futures
+import functools
+import gc
+import hashlib
+import hmac
+import json
 import logging
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
-from flask import Flask, request, send_from_directory
+import logging.handlers
+import mimetypes
+import queue
+import re
+import shutil
+import signal
+import ssl
+import sys
+import threading
+import tracemalloc
+from datetime import datetime, timedelta, time as dt_time
+from typing import Dict, List, Mapping, Optional, Tuple
+from flask import Flask, Response, request, send_from_directory
+from werkzeug.security import safe_join
 from slack_bolt import App
 from slack_bolt.adapter.flask import SlackRequestHandler
 from slack_sdk.errors import SlackApiError
+import slack_sdk.web.base_client as slack_base_client
+from slack_sdk.http_retry.builtin_handlers import RateLimitErrorRetryHandler
+from sqlalchemy import Float, bindparam, case, cast, delete, func, insert, select
+from sqlalchemy.exc import IntegrityError
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.executors.pool import ThreadPoolExecutor
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.date import DateTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from apscheduler.triggers.base import BaseTrigger
 from dotenv import load_dotenv
 import pytz
 import openai
+import httpx
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, each process runs its own scheduler
+    fcntl = None
 import random
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import uuid
+from collections import Counter, OrderedDict, deque
 from pathlib import Path
+from types import SimpleNamespace
 
-from database import init_db, get_db_session, CheckIn, DailyReport
+from database import DB_PATH, init_db, db_session, remove_db_session, engine, BotSetting, CheckIn, DailyReport, ReminderClick
 import time
 
 # Load environment variables
 load_dotenv()
 
+# Point libc at the zone file explicitly so local-time conversions (log timestamps, strftime)
+# don't stat /etc/localtime on every call when TZ is unset
+if "TZ" not in os.environ and hasattr(time, "tzset"):
+    os.environ["TZ"] = ":/etc/localtime"
+    time.tzset()
+
 # Initialize Flask app
 flask_app = Flask(__name__)
 
+# Slack listener thread pool size
+# Bolt acks each request as soon as the handler calls ack() and finishes the handler on this pool,
+# so slow Slack API calls in one handler don't hold up other events
+try:
+    SLACK_LISTENER_THREADS = int(os.environ.get("SLACK_LISTENER_THREADS", "20"))
+    if SLACK_LISTENER_THREADS < 1:
+        SLACK_LISTENER_THREADS = 20
+except (ValueError, TypeError):
+    SLACK_LISTENER_THREADS = 20
+
 # Initialize Slack app
 slack_app = App(
     token=os.environ.get("SLACK_BOT_TOKEN"),
-    signing_secret=os.environ.get("SLACK_SIGNING_SECRET")
+    signing_secret=os.environ.get("SLACK_SIGNING_SECRET"),
+    listener_executor=concurrent.futures.ThreadPoolExecutor(
+        max_workers=SLACK_LISTENER_THREADS,
+        thread_name_prefix="slack-listener"
+    )
 )
 
+# Besides slack_sdk's default retry on connection errors, retry 429 rate limits (honouring Retry-After)
+# Bolt copies these retry handlers into each listener's per-request client
+slack_app.client.retry_handlers.append(RateLimitErrorRetryHandler(max_retry_count=3))
+# slack_sdk's sync client opens a urllib connection per call and, without a context, builds a fresh
+# SSL context (re-reading the CA bundle) every time; share one, Bolt copies it to per-request clients too
+slack_app.client.ssl = ssl.create_default_context()
+
 # Initialize request handler
 handler = SlackRequestHandler(slack_app)
 
+# Encode Slack Web API request bodies with orjson when it is installed (stdlib json otherwise).
+# Only dumps is swapped; loads and JSONDecodeError handling stay on the stdlib module.
+if orjson is not None:
+    slack_base_client.json = SimpleNamespace(dumps=orjson.dumps, loads=json.loads, decoder=json.decoder)
+
+# Client-side per-method call budgets (calls per rolling minute), a little under Slack's tier limits,
+# so bursts (many timeouts expiring together, report name lookups, re-invites) wait here instead of drawing 429s
+SLACK_METHOD_RPM = {
+    "chat.postMessage": 60,
+    "chat.update": 50,
+    "users.info": 100,
+    "users.list": 20,
+    "conversations.invite": 50,
+    "groups.invite": 50,
+    "channels.invite": 50
+}
+_SLACK_CALL_TIMES = {method: deque() for method in SLACK_METHOD_RPM}  # time.monotonic() of recent calls
+_SLACK_BLOCKED_UNTIL = {}  # {method: time.monotonic() deadline} from Retry-After on a final 429
+_SLACK_RATE_LOCK = threading.Lock()
+
+
+def _wait_for_slack_budget(api_method: str):
+    """Sleep until api_method is within its per-minute budget, then count this call"""
+    limit = SLACK_METHOD_RPM.get(api_method)
+    if limit is None:
+        return
+    while True:
+        with _SLACK_RATE_LOCK:
+            now = time.monotonic()
+            calls = _SLACK_CALL_TIMES[api_method]
+            while calls and calls[0] <= now - 60:
+                calls.popleft()
+            wait = _SLACK_BLOCKED_UNTIL.get(api_method, 0) - now
+            if wait <= 0 and len(calls) >= limit:
+                wait = calls[0] + 60 - now
+            if wait <= 0:
+                calls.append(now)
+                return
+        time.sleep(wait)
+
+
+_slack_api_call = slack_base_client.BaseClient.api_call
+
+
+def _budgeted_api_call(self, api_method: str, **kwargs):
+    """BaseClient.api_call behind the per-method budget; a 429 that outlasts the retries pauses the method"""
+    _wait_for_slack_budget(api_method)
+    try:
+        return _slack_api_call(self, api_method, **kwargs)
+    except SlackApiError as e:
+        if e.response is not None and e.response.status_code == 429:
+            headers = e.response.headers or {}
+            try:
+                retry_after = float(headers.get("Retry-After") or headers.get("retry-after") or 1)
+            except (ValueError, TypeError):
+                retry_after = 1
+            with _SLACK_RATE_LOCK:
+                _SLACK_BLOCKED_UNTIL[api_method] = time.monotonic() + retry_after
+            logger.warning(f"Slack rate limited {api_method}, pausing it for {retry_after:.0f}s")
+        raise
+
+
+# Patched on the class so Bolt's per-request clients (created for each listener) share the budget too
+slack_base_client.BaseClient.api_call = _budgeted_api_call
+
 # Initialize database
 init_db()
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Configure logging: listener threads only enqueue records; a QueueListener thread formats
+# and writes them, so slow stderr/journal writes never hold up an event handler
+_LOG_HANDLER = logging.StreamHandler()
+_LOG_HANDLER.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+_LOG_QUEUE = queue.SimpleQueue()
+# Added directly rather than via basicConfig, which would give the QueueHandler a format of its own
+logging.root.addHandler(logging.handlers.QueueHandler(_LOG_QUEUE))
+# LOG_LEVEL=DEBUG also logs full event payloads (e.g. member_left_channel) and image error tracebacks
+_LOG_LEVEL_NAME = os.environ.get("LOG_LEVEL", "INFO").strip().upper()
+_LOG_LEVEL = logging.getLevelName(_LOG_LEVEL_NAME)
+logging.root.setLevel(_LOG_LEVEL if isinstance(_LOG_LEVEL, int) else logging.INFO)
+_LOG_LISTENER = logging.handlers.QueueListener(_LOG_QUEUE, _LOG_HANDLER)
+_LOG_LISTENER.start()
+# Registered before every other exit hook, so it runs last and flushes their log lines too
+atexit.register(_LOG_LISTENER.stop)
 logger = logging.getLogger(__name__)
+if not isinstance(_LOG_LEVEL, int):
+    logger.warning(f"Invalid LOG_LEVEL ({_LOG_LEVEL_NAME}), using INFO")
+
+# Store channel ID (set via environment or command; at startup SLACK_CHANNEL_ID wins, and a channel
+# saved by /set-channel is used only when SLACK_CHANNEL_ID is empty)
+# Written only through set_channel_id(); jobs read it once via get_channel_id() and use that value throughout
+ENV_CHANNEL_ID = os.environ.get("SLACK_CHANNEL_ID", "")
+CHANNEL_ID = ENV_CHANNEL_ID
+_CHANNEL_LOCK = threading.Lock()
+
+
+def get_channel_id() -> str:
+    """Get the current tracking channel ID"""
+    with _CHANNEL_LOCK:
+        return CHANNEL_ID
 
-# Store channel ID (set via environment or command)
-CHANNEL_ID = os.environ.get("SLACK_CHANNEL_ID", "")
+
+def set_channel_id(channel_id: str):
+    """Set the tracking channel ID and save it for restarts without SLACK_CHANNEL_ID"""
+    global CHANNEL_ID
+    with _CHANNEL_LOCK:
+        CHANNEL_ID = channel_id
+    try:
+        with db_session() as session:
+            session.merge(BotSetting(key="channel_id", value=channel_id))
+    except Exception as e:
+        logger.error(f"Error saving channel ID: {e}")
+
+
+def _load_saved_channel_id():
+    """Restore the channel set by /set-channel before the last restart, unless SLACK_CHANNEL_ID is set"""
+    global CHANNEL_ID
+    try:
+        with db_session() as session:
+            saved = session.get(BotSetting, "channel_id")
+        if not saved or saved.value == CHANNEL_ID:
+            return
+        if ENV_CHANNEL_ID:
+            logger.info(f"Using SLACK_CHANNEL_ID {ENV_CHANNEL_ID} instead of channel {saved.value} saved by /set-channel")
+            return
+        logger.info(f"Using channel {saved.value} saved by /set-channel (SLACK_CHANNEL_ID not set)")
+        CHANNEL_ID = saved.value
+    except Exception as e:
+        logger.warning(f"Could not load saved channel ID: {e}")
+
+
+_load_saved_channel_id()
 
 # Store user IDs for tracking (4 members)
 TRACKED_USERS = [uid.strip() for uid in os.environ.get("TRACKED_USER_IDS", "").split(",") if uid.strip()] if os.environ.get("TRACKED_USER_IDS") else []
+# Position of each tracked user, for O(1) membership checks and report ordering
+_TRACKED_INDEX = {uid: i for i, uid in enumerate(TRACKED_USERS)}
 
 # Time tracking on/off
 TIMETRACKING_ENABLED = os.environ.get("TIMETRACKING_ENABLED", "true").lower() == "true"
 
+# Run reminders and reports in this process (false = never; true = only if this process gets the scheduler lock)
+RUN_SCHEDULER = os.environ.get("RUN_SCHEDULER", "true").lower() in ("true", "1")
+# gunicorn workers all inherit the same RUN_SCHEDULER, so the first to lock this file runs the scheduler
+SCHEDULER_LOCK_FILE = os.environ.get("SCHEDULER_LOCK_FILE") or f"{DB_PATH}.scheduler.lock"
+_SCHEDULER_LOCK_HANDLE = None  # Kept open for the life of the process; the OS drops the lock when it exits
+
+# Memory diagnostics: /debug/memory answers only requests with a matching X-Debug-Token header
+DEBUG_TOKEN = os.environ.get("DEBUG_TOKEN", "")
+# Frames kept per traced allocation (0 = tracemalloc off; tracing slows allocation, so enable it only while investigating)
+try:
+    TRACEMALLOC_FRAMES = int(os.environ.get("TRACEMALLOC_FRAMES", "0"))
+    if TRACEMALLOC_FRAMES < 0:
+        TRACEMALLOC_FRAMES = 0
+        logger.warning("Invalid TRACEMALLOC_FRAMES, tracemalloc disabled")
+except (ValueError, TypeError):
+    TRACEMALLOC_FRAMES = 0
+    logger.warning("Invalid TRACEMALLOC_FRAMES, tracemalloc disabled")
+if TRACEMALLOC_FRAMES:
+    tracemalloc.start(TRACEMALLOC_FRAMES)
+
 # Auto re-invite on leave (only works if Slack sends leave events for this channel and bot has permissions)
 AUTO_REINVITE_ENABLED = os.environ.get("AUTO_REINVITE_ENABLED", "false").lower() == "true"
 AUTO_REINVITE_DELAY_SECONDS = int(os.environ.get("AUTO_REINVITE_DELAY_SECONDS", "5"))
+# Leave events already handled, as (channel, user, event_ts) -> monotonic time seen, oldest first;
+# a redelivered event within LEAVE_DEDUPE_SECONDS is dropped instead of re-inviting twice
+_SEEN_LEAVES = OrderedDict()
+_SEEN_LEAVES_LOCK = threading.Lock()
+LEAVE_DEDUPE_SECONDS = 60
+LEAVE_DEDUPE_MAX = 1024
 
 # Timezone configuration (EST)
 EST = pytz.timezone('US/Eastern')
 
-# Store message timestamps to prevent multiple clicks on same reminder
-# Format: {message_ts: {user_id: True}}
-clicked_messages = {}
+# Day start and display formats shared by reminders, check-ins and reports
+DAY_START_TIME = dt_time.min
+TIME_FORMAT = "%H:%M:%S"
+DATE_FORMAT = "%Y-%m-%d"
 
-# Store message info for timeout disabling
-# Format: {message_ts: {"channel_id": str, "blocks": list}}
-message_info = {}
+# Store message timestamps to prevent multiple clicks on same reminder
+# Format: {message_ts: set(user_id)}, oldest reminder first; expired reminders are dropped as new ones are
+# posted, and CLICKED_MESSAGES_MAX caps the rest
+clicked_messages = OrderedDict()
+_CLICKED_MESSAGES_LOCK = threading.Lock()  # Guards clicked_messages (scheduler and listener threads)
+CLICKED_MESSAGES_MAX = 500
 
 # Button timeout configuration (in minutes)
 try:
@@ -84,14 +300,147 @@ except (ValueError, TypeError):
     BUTTON_TIMEOUT_MINUTES = 3
     logger.warning("Invalid BUTTON_TIMEOUT_MINUTES, using default 3")
 
-# Store disabled messages (messages where buttons are already disabled)
-disabled_messages = set()
+# Check-in write batching configuration
+# Check-ins are queued by the button handler and inserted in batches by a background thread
+try:
+    CHECKIN_BATCH_SIZE = int(os.environ.get("CHECKIN_BATCH_SIZE", "50"))
+    if CHECKIN_BATCH_SIZE < 1:
+        CHECKIN_BATCH_SIZE = 50
+        logger.warning("Invalid CHECKIN_BATCH_SIZE, using default 50")
+except (ValueError, TypeError):
+    CHECKIN_BATCH_SIZE = 50
+    logger.warning("Invalid CHECKIN_BATCH_SIZE, using default 50")
+
+try:
+    CHECKIN_FLUSH_INTERVAL_MS = int(os.environ.get("CHECKIN_FLUSH_INTERVAL_MS", "500"))
+    if CHECKIN_FLUSH_INTERVAL_MS < 0:
+        CHECKIN_FLUSH_INTERVAL_MS = 500
+        logger.warning("Invalid CHECKIN_FLUSH_INTERVAL_MS, using default 500")
+except (ValueError, TypeError):
+    CHECKIN_FLUSH_INTERVAL_MS = 500
+    logger.warning("Invalid CHECKIN_FLUSH_INTERVAL_MS, using default 500")
+
+# Cache Slack display names to avoid a users.info call per lookup
+# Format: {user_id: (name, expires_at)} where expires_at is a time.monotonic() value
+_USER_NAME_CACHE = {}
+_USER_NAME_CACHE_LOCK = threading.Lock()  # Listener threads, scheduler jobs and the directory refresh all write here
+USER_DIRECTORY_REFRESH_HOURS = 6
+# Entries outlive one refresh interval so scheduled refreshes replace them before they expire
+USER_NAME_CACHE_TTL_SECONDS = (USER_DIRECTORY_REFRESH_HOURS + 1) * 3600
+# Report names missing from the cache are fetched with one users.list pass once this many are missing
+USER_PREFETCH_MIN_MISSES = 2
+# Remaining users.info lookups for a report run here, alongside its DB queries
+_USER_LOOKUP_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="user-lookup")
+
+# Cache generated daily reports so repeated report requests skip the DB and Slack lookups
+# Format: {date: (report, expires_at)} where expires_at is a time.monotonic() value
+_REPORT_CACHE = {}
+REPORT_CACHE_TTL_SECONDS = 60
+# Writes seen per date, bumped by the check-in writer after each commit: a report stores its result
+# only if no write for its date landed while it was querying (it may have read the older rows)
+_REPORT_GENERATIONS = {}
+_REPORT_CACHE_LOCK = threading.Lock()  # Guards the generation check and the cache store together
+
+# Slack blocks of the last formatted report per date
+# Format: {date_str: (report, blocks)}; reused while generate_daily_report keeps returning that same report object
+_REPORT_BLOCKS_CACHE = {}
+
+# Report queries built once with bound parameters so SQLAlchemy compiles them once per process
+# Day ranges are half-open so the index range scan on timestamp has a clean upper bound
+_DAY_STATUS_COUNTS_QUERY = (
+    select(CheckIn.user_id, CheckIn.status, func.count())
+    .where(CheckIn.timestamp >= bindparam("start"), CheckIn.timestamp < bindparam("end"))
+    .group_by(CheckIn.user_id, CheckIn.status)
+)
+# Working seconds per user, computed in SQL: each check-in closes the period opened by the user's
+# previous check-in, which counts only if that one was "working" (id breaks same-second ties)
+_DAY_CHECKIN_STEPS = (
+    select(
+        CheckIn.user_id,
+        CheckIn.timestamp,
+        func.lag(CheckIn.status).over(partition_by=CheckIn.user_id, order_by=(CheckIn.timestamp, CheckIn.id)).label("prev_status"),
+        func.lag(CheckIn.timestamp).over(partition_by=CheckIn.user_id, order_by=(CheckIn.timestamp, CheckIn.id)).label("prev_timestamp")
+    )
+    .where(CheckIn.timestamp >= bindparam("start"), CheckIn.timestamp < bindparam("end"))
+    .subquery()
+)
+_DAY_WORKING_SECONDS_QUERY = (
+    select(
+        _DAY_CHECKIN_STEPS.c.user_id,
+        func.sum(case(
+            (_DAY_CHECKIN_STEPS.c.prev_status == "working", _DAY_CHECKIN_STEPS.c.timestamp - _DAY_CHECKIN_STEPS.c.prev_timestamp),
+            else_=0
+        ))
+    )
+    .group_by(_DAY_CHECKIN_STEPS.c.user_id)
+)
+
+# Pending check-in rows waiting to be written
+# Format: {"user_id": str, "status": str, "timestamp": int epoch seconds}
+_CHECKIN_QUEUE = queue.Queue()
+
+# Check-in status posts waiting to be sent to the channel
+# The poster thread groups everything queued within STATUS_POST_INTERVAL_MS into one message per channel
+# Format: {"channel_id": str, "section_text": str, "fallback_text": str, "status_emoji": str, "respond": callable}
+_STATUS_POST_QUEUE = queue.Queue()
+STATUS_POST_INTERVAL_MS = 200
+STATUS_POST_MAX_BATCH = 25  # Keeps each grouped message well under Slack's 50-block limit
+STATUS_POST_MIN_SPACING_SECONDS = 1.0
 
 # Image configuration
 IMAGE_ENABLED = os.environ.get("IMAGE_ENABLED", "true").lower() == "true"
 IMAGES_DIR = Path(os.environ.get("IMAGES_DIR", "images"))
 IMAGES_DIR.mkdir(exist_ok=True)  # Create images directory if it doesn't exist
 
+# Pre-generated reminder images so DALL-E calls stay off the reminder job
+# IMAGE_POOL_SIZE images are kept ready; each reminder takes one and schedules a background refill
+try:
+    IMAGE_POOL_SIZE = int(os.environ.get("IMAGE_POOL_SIZE", "2"))
+    if IMAGE_POOL_SIZE < 1:
+        IMAGE_POOL_SIZE = 2
+        logger.warning("Invalid IMAGE_POOL_SIZE, using default 2")
+except (ValueError, TypeError):
+    IMAGE_POOL_SIZE = 2
+    logger.warning("Invalid IMAGE_POOL_SIZE, using default 2")
+# IMAGE_EVERY_N_REMINDERS: attach an image to every Nth reminder only (1 = every reminder)
+try:
+    IMAGE_EVERY_N_REMINDERS = int(os.environ.get("IMAGE_EVERY_N_REMINDERS", "1"))
+    if IMAGE_EVERY_N_REMINDERS < 1:
+        IMAGE_EVERY_N_REMINDERS = 1
+        logger.warning("Invalid IMAGE_EVERY_N_REMINDERS, using default 1")
+except (ValueError, TypeError):
+    IMAGE_EVERY_N_REMINDERS = 1
+    logger.warning("Invalid IMAGE_EVERY_N_REMINDERS, using default 1")
+_REMINDER_COUNT = 0  # Reminders sent by this process; only the scheduler thread updates it
+_IMAGE_POOL = deque(maxlen=IMAGE_POOL_SIZE)
+_IMAGE_POOL_LOCK = threading.Lock()  # Also guards the refill backoff counters below
+# After failed refills (OpenAI errors, timeouts, rate limits) skip the next 1, 2, 4, ... refills, up to this many
+IMAGE_REFILL_MAX_SKIPS = 16
+_IMAGE_REFILL_FAILURES = 0
+_IMAGE_REFILL_SKIPS = 0
+# When OpenAI throttles or errors server-side, stop calling it for this long (time.monotonic() deadline)
+IMAGE_CIRCUIT_COOLDOWN_SECONDS = 300
+_IMAGE_CIRCUIT_OPEN_UNTIL = 0.0
+
+# Saved images per prompt: with this many on disk and the newest under IMAGE_VARIANT_MAX_AGE_DAYS old,
+# reminders reuse a random one instead of generating
+IMAGE_PROMPT_VARIANTS = 3
+IMAGE_VARIANT_MAX_AGE_DAYS = 7
+
+# Generated images reused per prompt, so repeated prompts don't pay for a new DALL-E generation
+# Format: {prompt: (local_image_url, local_filepath, expires_at)} where expires_at is a time.monotonic() value; LRU order
+try:
+    IMAGE_CACHE_TTL_HOURS = float(os.environ.get("IMAGE_CACHE_TTL_HOURS", "24"))
+    if IMAGE_CACHE_TTL_HOURS < 0:
+        IMAGE_CACHE_TTL_HOURS = 24
+        logger.warning("Invalid IMAGE_CACHE_TTL_HOURS, using default 24")
+except (ValueError, TypeError):
+    IMAGE_CACHE_TTL_HOURS = 24
+    logger.warning("Invalid IMAGE_CACHE_TTL_HOURS, using default 24")
+_IMAGE_CACHE = OrderedDict()
+_IMAGE_CACHE_LOCK = threading.Lock()
+IMAGE_CACHE_MAX = 32
+
 # Server configuration for image URLs
 SERVER_URL = os.environ.get("SERVER_URL", "")  # e.g., http://your-vps-ip:3000 or https://yourdomain.com
 PORT = int(os.environ.get("PORT", 3000))
@@ -100,29 +449,113 @@ PORT = int(os.environ.get("PORT", 3000))
 OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY", "")
 OPENAI_IMAGE_PROMPT = os.environ.get("OPENAI_IMAGE_PROMPT", "")  # Custom prompt from env, or use random default
 
+# Pooled HTTP session for image downloads (keep-alive to the image CDN, retries on throttling and transient 5xx)
+_HTTP_SESSION = requests.Session()
+_HTTP_SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=8,
+    # 429/503 retries wait for the server's Retry-After when it sends one
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 502, 503, 504], allowed_methods=["GET"])
+))
+
+# OpenAI client shared across image generations so its HTTP connection pool is reused
+# trust_env=False keeps proxy environment variables from interfering with the API connection
+_OPENAI_CLIENT = openai.OpenAI(
+    api_key=OPENAI_API_KEY,
+    http_client=httpx.Client(trust_env=False, timeout=120.0)
+) if OPENAI_API_KEY else None
+
+
+def _cache_user_name(user_id: str, name: str):
+    """Store a display name in the user name cache"""
+    with _USER_NAME_CACHE_LOCK:
+        _USER_NAME_CACHE[user_id] = (name, time.monotonic() + USER_NAME_CACHE_TTL_SECONDS)
+
+
+def _cached_user_name(user_id: str) -> Optional[str]:
+    """Get a display name from the user name cache if it hasn't expired"""
+    cached = _USER_NAME_CACHE.get(user_id)
+    if cached and time.monotonic() < cached[1]:
+        return cached[0]
+    return None
+
 
 def get_user_name(user_id: str) -> str:
-    """Get user's display name from Slack"""
+    """Get user's display name from Slack (cached for USER_NAME_CACHE_TTL_SECONDS)"""
+    cached = _cached_user_name(user_id)
+    if cached is not None:
+        return cached
+    
     try:
         result = slack_app.client.users_info(user=user_id)
         user = result["user"]
-        return user.get("real_name") or user.get("name", user_id)
+        name = user.get("real_name") or user.get("name", user_id)
+        _cache_user_name(user_id, name)
+        return name
     except SlackApiError as e:
-        logger.error(f"Error fetching user info: {e}")
+        logger.error("Error fetching user info: %s", e)
         return user_id
 
 
+def prefetch_user_names(user_ids):
+    """Resolve uncached names with one users.list pass when several are missing (users.info otherwise)"""
+    missing = [uid for uid in user_ids if _cached_user_name(uid) is None]
+    if len(missing) >= USER_PREFETCH_MIN_MISSES:
+        prewarm_user_cache()
+
+
+def prewarm_user_cache():
+    """Fill the user name cache from users.list (one paginated call instead of users.info per user)"""
+    try:
+        cursor = None
+        count = 0
+        while True:
+            result = slack_app.client.users_list(limit=200, cursor=cursor)
+            for member in result.get("members", []):
+                user_id = member.get("id")
+                if not user_id:
+                    continue
+                _cache_user_name(user_id, member.get("real_name") or member.get("name", user_id))
+                count += 1
+            cursor = result.get("response_metadata", {}).get("next_cursor")
+            if not cursor:
+                break
+        logger.info(f"Pre-warmed user name cache with {count} users")
+    except Exception as e:
+        logger.warning(f"Could not pre-warm user name cache: {e}")
+
+
 def get_est_time() -> datetime:
     """Get current time in EST timezone"""
     return datetime.now(EST)
 
+# Last formatted (epoch_second, time_str, date_str); replaced as one tuple so readers never see a torn slot
+_EST_STAMP_SLOT = (None, "", "")
+
+def format_est_stamp(est_time: datetime) -> Tuple[str, str]:
+    """Return (time_str, date_str) for an EST datetime, reusing the strings within the same second"""
+    global _EST_STAMP_SLOT
+    second = int(est_time.timestamp())
+    slot = _EST_STAMP_SLOT
+    if slot[0] != second:
+        slot = (second, est_time.strftime(TIME_FORMAT), est_time.strftime(DATE_FORMAT))
+        _EST_STAMP_SLOT = slot
+    return slot[1], slot[2]
+
+
+IMAGE_DOWNLOAD_CHUNK_BYTES = 1024 * 1024
+
+
 def download_image_from_url(image_url: str, filename: str) -> Optional[str]:
     """Download image from URL and save to local folder"""
+    # Written under a temporary name and renamed when complete, so a failed or partial download
+    # never leaves a file that variant reuse or /images/ could hand out
+    part_path = None
     try:
-        logger.info(f"Starting download from {image_url} to {filename}")
+        logger.debug("Starting download from %s to %s", image_url, filename)
         
         # Download image
-        response = requests.get(image_url, timeout=30, stream=True)
+        response = _HTTP_SESSION.get(image_url, timeout=30, stream=True)
         response.raise_for_status()
         
         # Get file path
@@ -132,22 +565,20 @@ def download_image_from_url(image_url: str, filename: str) -> Optional[str]:
         # Ensure directory exists
         IMAGES_DIR.mkdir(parents=True, exist_ok=True)
         
-        # Save image to local folder
-        with open(filepath_abs, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
-        
-        # Verify file was saved
-        if not filepath_abs.exists():
-            logger.error(f"File was not created at {filepath_abs}")
-            return None
+        # Save image to local folder (DALL-E PNGs are ~1-3 MB, so copy the raw stream in large chunks)
+        response.raw.decode_content = True
+        part_path = filepath_abs.with_name(f".{filepath_abs.name}.part")
+        with open(part_path, 'wb') as f:
+            shutil.copyfileobj(response.raw, f, length=IMAGE_DOWNLOAD_CHUNK_BYTES)
+            file_size = f.tell()
         
-        file_size = filepath_abs.stat().st_size
+        # Verify something was saved (file position after writing - no extra stat calls)
         if file_size == 0:
             logger.error(f"Downloaded file is empty: {filepath_abs}")
             return None
         
+        os.replace(part_path, filepath_abs)
+        part_path = None
         logger.info(f"Successfully downloaded image to {filepath_abs} ({file_size} bytes)")
         return str(filepath_abs)
         
@@ -159,12 +590,30 @@ def download_image_from_url(image_url: str, filename: str) -> Optional[str]:
         return None
     except Exception as e:
         logger.error(f"Unexpected error downloading image from {image_url}: {e}")
-        import traceback
-        logger.debug(f"Traceback: {traceback.format_exc()}")
+        logger.debug("Traceback:", exc_info=True)
         return None
+    finally:
+        if part_path is not None:
+            try:
+                part_path.unlink(missing_ok=True)
+            except OSError as e:
+                logger.warning(f"Could not remove partial download {part_path}: {e}")
+
+# Default humorous prompts for work/check-in reminders
+_DEFAULT_IMAGE_PROMPTS = (
+    "A cute cartoon robot holding a clipboard and looking at a clock, office setting, friendly and humorous style",
+    "A funny cartoon character frantically checking in on a computer, comedic office scene, colorful and playful",
+    "A whimsical illustration of a clock with arms pointing at check-in time, surrounded by happy office workers, cartoon style",
+    "A humorous cartoon of a friendly robot reminding people to check in, modern office background, fun and cheerful",
+    "A playful illustration of a calendar with a checkmark, surrounded by happy emoji faces, bright and cheerful style",
+    "A cute cartoon of a clock wearing sunglasses and holding a 'check-in' sign, fun office environment, colorful",
+    "A funny cartoon scene of a robot doing a happy dance while holding a time card, office setting, playful style",
+    "A whimsical illustration of a clock tower with a friendly face, reminding people to check in, cartoon style",
+)
 
 def generate_humorous_image() -> Optional[str]:
     """Generate a humorous image using OpenAI DALL-E for check-in reminders, download and return local URL"""
+    global _IMAGE_CIRCUIT_OPEN_UNTIL
     # Check if images are enabled
     if not IMAGE_ENABLED:
         logger.debug("Images are disabled in configuration")
@@ -174,101 +623,151 @@ def generate_humorous_image() -> Optional[str]:
         logger.debug("OpenAI API key not set, skipping image generation")
         return None
     
+    # Local image URL - MUST use SERVER_URL; check before paying for a generation that can't be served
+    if not SERVER_URL:
+        logger.error("CRITICAL: SERVER_URL not set in .env file. Cannot generate image URL for Slack.")
+        logger.error("Please set SERVER_URL in .env file (e.g., SERVER_URL=http://your-vps-ip:3000)")
+        return None
+    
     # Use custom prompt from env if provided, otherwise use random from default list
     if OPENAI_IMAGE_PROMPT:
         prompt = OPENAI_IMAGE_PROMPT
-        logger.info(f"Using custom prompt from env: {prompt}")
+        logger.debug("Using custom prompt from env: %s", prompt)
     else:
-        # Default humorous prompts for work/check-in reminders
-        prompts = [
-            "A cute cartoon robot holding a clipboard and looking at a clock, office setting, friendly and humorous style",
-            "A funny cartoon character frantically checking in on a computer, comedic office scene, colorful and playful",
-            "A whimsical illustration of a clock with arms pointing at check-in time, surrounded by happy office workers, cartoon style",
-            "A humorous cartoon of a friendly robot reminding people to check in, modern office background, fun and cheerful",
-            "A playful illustration of a calendar with a checkmark, surrounded by happy emoji faces, bright and cheerful style",
-            "A cute cartoon of a clock wearing sunglasses and holding a 'check-in' sign, fun office environment, colorful",
-            "A funny cartoon scene of a robot doing a happy dance while holding a time card, office setting, playful style",
-            "A whimsical illustration of a clock tower with a friendly face, reminding people to check in, cartoon style"
-        ]
-        prompt = random.choice(prompts)
-        logger.info(f"Using random default prompt: {prompt}")
+        prompt = random.choice(_DEFAULT_IMAGE_PROMPTS)
+        logger.debug("Using random default prompt: %s", prompt)
+    
+    # Reuse this prompt's earlier image while it is fresh and still on disk
+    with _IMAGE_CACHE_LOCK:
+        cached = _IMAGE_CACHE.get(prompt)
+        if cached and time.monotonic() < cached[2] and os.path.exists(cached[1]):
+            _IMAGE_CACHE.move_to_end(prompt)
+            logger.info(f"Reusing cached image for prompt: {cached[0]}")
+            return cached[0]
+    
+    # Files are named after the prompt's hash, so saved variants are found again after a restart;
+    # once enough recent variants exist, pick one instead of paying for another generation
+    # (IMAGE_CACHE_TTL_HOURS=0 turns all reuse off, including this)
+    prompt_key = hashlib.sha256(prompt.encode()).hexdigest()[:16]
+    variants = []
+    if IMAGE_CACHE_TTL_HOURS > 0:
+        for variant in IMAGES_DIR.glob(f"{prompt_key}_*.png"):
+            try:
+                variant_stat = variant.stat()
+            except OSError:
+                continue
+            # Skip empty files (e.g. left over from a download before downloads were written atomically)
+            if variant_stat.st_size > 0:
+                variants.append((variant, variant_stat.st_mtime))
+    if len(variants) >= IMAGE_PROMPT_VARIANTS:
+        newest_mtime = max(mtime for _, mtime in variants)
+        if time.time() - newest_mtime < IMAGE_VARIANT_MAX_AGE_DAYS * 86400:
+            reused_url = f"{SERVER_URL.rstrip('/')}/images/{random.choice(variants)[0].name}"
+            logger.info(f"Reusing saved image variant for prompt: {reused_url}")
+            return reused_url
+    
+    if time.monotonic() < _IMAGE_CIRCUIT_OPEN_UNTIL:
+        logger.info("OpenAI image generation paused after rate limiting/server errors")
+        return None
     
     try:
+        response = _OPENAI_CLIENT.images.generate(
+            model="dall-e-3",
+            prompt=prompt,
+            size="1024x1024",
+            quality="standard",
+            n=1,
+        )
         
-        # Use OpenAI client - ensure clean initialization
-        # Remove any proxy-related environment variables that might interfere
-        import os
-        env_backup = {}
-        proxy_vars = ['HTTP_PROXY', 'HTTPS_PROXY', 'http_proxy', 'https_proxy', 'ALL_PROXY', 'all_proxy']
-        for var in proxy_vars:
-            if var in os.environ:
-                env_backup[var] = os.environ[var]
-                del os.environ[var]
+        openai_image_url = response.data[0].url
+        logger.debug("Generated image URL from OpenAI: %s", openai_image_url)
         
-        try:
-            # Initialize OpenAI client with just the API key
-            client = openai.OpenAI(api_key=OPENAI_API_KEY)
-            
-            response = client.images.generate(
-                model="dall-e-3",
-                prompt=prompt,
-                size="1024x1024",
-                quality="standard",
-                n=1,
-            )
-            
-            openai_image_url = response.data[0].url
-            logger.info(f"Generated image URL from OpenAI: {openai_image_url}")
-            
-            # Download image to local folder - MUST download before posting
-            image_filename = f"{uuid.uuid4()}.png"
-            logger.info(f"Downloading image from OpenAI to local folder: {image_filename}")
-            
-            local_filepath = download_image_from_url(openai_image_url, image_filename)
-            
-            if not local_filepath:
-                logger.error("CRITICAL: Failed to download image from OpenAI. Cannot proceed without local copy.")
-                return None  # Don't use OpenAI URL - return None to skip image
-            
-            # Verify file was saved
-            if not os.path.exists(local_filepath):
-                logger.error(f"CRITICAL: Image file not found at {local_filepath} after download")
-                return None
-            
-            file_size = os.path.getsize(local_filepath)
-            logger.info(f"Image saved successfully: {local_filepath} ({file_size} bytes)")
-            
-            # Generate local URL for the image - MUST use SERVER_URL
-            if not SERVER_URL:
-                logger.error("CRITICAL: SERVER_URL not set in .env file. Cannot generate image URL for Slack.")
-                logger.error("Please set SERVER_URL in .env file (e.g., SERVER_URL=http://your-vps-ip:3000)")
-                return None
-            
-            # Always use SERVER_URL to generate the local image URL
-            local_image_url = f"{SERVER_URL.rstrip('/')}/images/{image_filename}"
-            logger.info(f"Image will be served from local URL: {local_image_url}")
-            
-            return local_image_url
-            
-        finally:
-            # Restore environment variables
-            for var, value in env_backup.items():
-                os.environ[var] = value
+        # Download image to local folder - MUST download before posting
+        image_filename = f"{prompt_key}_{uuid.uuid4()}.png"
+        logger.debug("Downloading image from OpenAI to local folder: %s", image_filename)
         
+        local_filepath = download_image_from_url(openai_image_url, image_filename)
+        
+        if not local_filepath:
+            logger.error("CRITICAL: Failed to download image from OpenAI. Cannot proceed without local copy.")
+            return None  # Don't use OpenAI URL - return None to skip image
+        
+        # Always use SERVER_URL to generate the local image URL
+        local_image_url = f"{SERVER_URL.rstrip('/')}/images/{image_filename}"
+        logger.debug("Image will be served from local URL: %s", local_image_url)
+        
+        if IMAGE_CACHE_TTL_HOURS > 0:
+            with _IMAGE_CACHE_LOCK:
+                _IMAGE_CACHE[prompt] = (local_image_url, local_filepath, time.monotonic() + IMAGE_CACHE_TTL_HOURS * 3600)
+                _IMAGE_CACHE.move_to_end(prompt)
+                while len(_IMAGE_CACHE) > IMAGE_CACHE_MAX:
+                    _IMAGE_CACHE.popitem(last=False)
+        
+        return local_image_url
+        
+    except (openai.RateLimitError, openai.InternalServerError, openai.APITimeoutError) as e:
+        # The client already retried; give OpenAI a cooldown instead of hitting it again next reminder
+        _IMAGE_CIRCUIT_OPEN_UNTIL = time.monotonic() + IMAGE_CIRCUIT_COOLDOWN_SECONDS
+        logger.error(f"OpenAI image generation throttled or failing ({e}), pausing for {IMAGE_CIRCUIT_COOLDOWN_SECONDS} seconds")
+        return None
     except Exception as e:
         logger.error(f"Error generating image with OpenAI: {e}")
         # Log full error details for debugging
-        import traceback
-        logger.debug(f"Full traceback: {traceback.format_exc()}")
+        logger.debug("Full traceback:", exc_info=True)
         return None
 
+def _refill_image_pool():
+    """Generate images until the reminder image pool is full"""
+    global _IMAGE_REFILL_FAILURES, _IMAGE_REFILL_SKIPS
+    if not IMAGE_ENABLED or not OPENAI_API_KEY:
+        return
+    
+    while len(_IMAGE_POOL) < IMAGE_POOL_SIZE:
+        image_url = generate_humorous_image()
+        if not image_url:
+            # Don't retry in a loop on OpenAI/download errors; back off before the next reminders refill again
+            with _IMAGE_POOL_LOCK:
+                _IMAGE_REFILL_FAILURES += 1
+                _IMAGE_REFILL_SKIPS = min(2 ** (_IMAGE_REFILL_FAILURES - 1), IMAGE_REFILL_MAX_SKIPS)
+            logger.warning(f"Image pool refill failed, skipping the next {_IMAGE_REFILL_SKIPS} refill(s)")
+            break
+        with _IMAGE_POOL_LOCK:
+            _IMAGE_POOL.append(image_url)
+            _IMAGE_REFILL_FAILURES = 0
+        logger.info(f"Image pool: {len(_IMAGE_POOL)}/{IMAGE_POOL_SIZE} images ready")
+
+
+def take_pooled_image() -> Optional[str]:
+    """Take a pre-generated reminder image URL (None if the pool is empty) and schedule a refill"""
+    global _IMAGE_REFILL_SKIPS
+    if not IMAGE_ENABLED or not OPENAI_API_KEY:
+        return None
+    
+    with _IMAGE_POOL_LOCK:
+        image_url = _IMAGE_POOL.popleft() if _IMAGE_POOL else None
+        skip_refill = _IMAGE_REFILL_SKIPS > 0
+        if skip_refill:
+            _IMAGE_REFILL_SKIPS -= 1
+    if not image_url:
+        logger.warning("Image pool empty, sending reminder without image")
+    if skip_refill:
+        logger.info("Backing off image generation after a failed refill")
+        return image_url
+    
+    scheduler.add_job(
+        func=_refill_image_pool,
+        id="image_pool_refill",
+        name="Refill reminder image pool",
+        executor="io",
+        replace_existing=True
+    )
+    return image_url
+
+
 def disable_buttons_after_timeout(message_ts: str, channel_id: str, original_blocks: List[Dict]):
     """Disable all buttons in a reminder message after timeout"""
     try:
-        # Mark message as disabled FIRST (before API call) to prevent any new clicks
-        disabled_messages.add(message_ts)
-        logger.info(f"Marked message {message_ts} as disabled")
-        
+        # New clicks are already rejected by is_reminder_expired (the reminder's age is past the timeout)
         # Create new blocks with disabled buttons
         new_blocks = []
         for block in original_blocks:
@@ -277,13 +776,16 @@ def disable_buttons_after_timeout(message_ts: str, channel_id: str, original_blo
                 new_elements = []
                 for element in block.get("elements", []):
                     if element.get("type") == "button":
-                        # Create disabled button (remove style field, set value)
-                        disabled_button = {
-                            "type": "button",
-                            "text": element.get("text", {}),
-                            "action_id": element.get("action_id", ""),
-                            "value": "disabled"
-                        }
+                        # Use the pre-built disabled button, keeping this message's shuffled order
+                        disabled_button = _DISABLED_REMINDER_BUTTONS.get(element.get("action_id"))
+                        if disabled_button is None:
+                            # Create disabled button (remove style field, set value)
+                            disabled_button = {
+                                "type": "button",
+                                "text": element.get("text", {}),
+                                "action_id": element.get("action_id", ""),
+                                "value": "disabled"
+                            }
                         # Don't include style field at all for disabled buttons
                         new_elements.append(disabled_button)
                 
@@ -305,10 +807,8 @@ def disable_buttons_after_timeout(message_ts: str, channel_id: str, original_blo
         )
         
         # Remove from tracking
-        if message_ts in message_info:
-            del message_info[message_ts]
-        if message_ts in clicked_messages:
-            del clicked_messages[message_ts]
+        with _CLICKED_MESSAGES_LOCK:
+            clicked_messages.pop(message_ts, None)
         
         logger.info(f"Disabled buttons for message {message_ts} after {BUTTON_TIMEOUT_MINUTES} minutes timeout")
     except SlackApiError as e:
@@ -338,32 +838,77 @@ def schedule_button_timeout(message_ts: str, channel_id: str, blocks: List[Dict]
     except Exception as e:
         logger.error(f"Error scheduling button timeout for message {message_ts}: {e}")
 
+# Static parts of the hourly reminder message, built once and shared by every reminder
+_REMINDER_HEADER_BLOCK = {
+    "type": "header",
+    "text": {
+        "type": "plain_text",
+        "text": "⏰ Hourly Check-In Reminder"
+    }
+}
+_REMINDER_SECTION_TEXT = "*Time (EST):* {time_str}\n*Date:* {date_str}\n\nPlease confirm your working status by clicking the button below:"
+_REMINDER_BUTTONS = [
+    {
+        "type": "button",
+        "text": {
+            "type": "plain_text",
+            "text": "✅ I'm Working"
+        },
+        "style": "primary",
+        "action_id": "checkin_working",
+        "value": "working"
+    },
+    {
+        "type": "button",
+        "text": {
+            "type": "plain_text",
+            "text": "⏸️ On Break"
+        },
+        "action_id": "checkin_break",
+        "value": "break"
+    },
+    {
+        "type": "button",
+        "text": {
+            "type": "plain_text",
+            "text": "🏠 Away"
+        },
+        "action_id": "checkin_away",
+        "value": "away"
+    }
+]
+# Expired versions of the reminder buttons (no style, value "disabled"), keyed by action_id
+_DISABLED_REMINDER_BUTTONS = {
+    button["action_id"]: {
+        "type": "button",
+        "text": button["text"],
+        "action_id": button["action_id"],
+        "value": "disabled"
+    }
+    for button in _REMINDER_BUTTONS
+}
+
 def send_hourly_checkin_reminder():
     """Send hourly check-in reminder with interactive button and AI-generated humorous image"""
+    global _REMINDER_COUNT
     if not TIMETRACKING_ENABLED:
         logger.debug("Time tracking disabled (TIMETRACKING_ENABLED=false). Skipping reminder.")
         return
-    if not CHANNEL_ID:
+    channel_id = get_channel_id()
+    if not channel_id:
         logger.warning("Channel ID not set. Skipping reminder.")
         return
     
     try:
         est_now = get_est_time()
-        time_str = est_now.strftime('%H:%M:%S')
-        date_str = est_now.strftime('%Y-%m-%d')
+        time_str = est_now.strftime(TIME_FORMAT)
+        date_str = est_now.strftime(DATE_FORMAT)
         
-        # Generate humorous image
-        image_url = generate_humorous_image()
+        # Take a pre-generated humorous image (every IMAGE_EVERY_N_REMINDERS-th reminder)
+        image_url = take_pooled_image() if _REMINDER_COUNT % IMAGE_EVERY_N_REMINDERS == 0 else None
+        _REMINDER_COUNT += 1
         
-        blocks = [
-            {
-                "type": "header",
-                "text": {
-                    "type": "plain_text",
-                    "text": "⏰ Hourly Check-In Reminder"
-                }
-            }
-        ]
+        blocks = [_REMINDER_HEADER_BLOCK]
         
         # Add image if generated successfully
         if image_url:
@@ -378,194 +923,395 @@ def send_hourly_checkin_reminder():
                 "type": "section",
                 "text": {
                     "type": "mrkdwn",
-                    "text": f"*Time (EST):* {time_str}\n*Date:* {date_str}\n\nPlease confirm your working status by clicking the button below:"
+                    "text": _REMINDER_SECTION_TEXT.format(time_str=time_str, date_str=date_str)
                 }
             },
             {
                 "type": "actions",
-                "elements": (lambda buttons: random.sample(buttons, len(buttons)))([
-                    {
-                        "type": "button",
-                        "text": {
-                            "type": "plain_text",
-                            "text": "✅ I'm Working"
-                        },
-                        "style": "primary",
-                        "action_id": "checkin_working",
-                        "value": "working"
-                    },
-                    {
-                        "type": "button",
-                        "text": {
-                            "type": "plain_text",
-                            "text": "⏸️ On Break"
-                        },
-                        "action_id": "checkin_break",
-                        "value": "break"
-                    },
-                    {
-                        "type": "button",
-                        "text": {
-                            "type": "plain_text",
-                            "text": "🏠 Away"
-                        },
-                        "action_id": "checkin_away",
-                        "value": "away"
-                    }
-                ])
+                "elements": random.sample(_REMINDER_BUTTONS, len(_REMINDER_BUTTONS))
             }
         ])
         
         response = slack_app.client.chat_postMessage(
-            channel=CHANNEL_ID,
+            channel=channel_id,
             blocks=blocks,
             text="Hourly Check-In Reminder"
         )
         
         # Store message timestamp to track clicks
         message_ts = response["ts"]
-        clicked_messages[message_ts] = {}
-        
-        # Store message info for timeout disabling
-        message_info[message_ts] = {
-            "channel_id": CHANNEL_ID,
-            "blocks": blocks.copy()  # Store original blocks
-        }
+        with _CLICKED_MESSAGES_LOCK:
+            clicked_messages[message_ts] = set()
+            # Drop expired reminders (also covers ones whose timeout disable failed), then cap the rest
+            while clicked_messages and is_reminder_expired(next(iter(clicked_messages))):
+                clicked_messages.popitem(last=False)
+            while len(clicked_messages) > CLICKED_MESSAGES_MAX:
+                clicked_messages.popitem(last=False)
+        prune_reminder_clicks()
         
-        # Schedule button disabling after timeout
-        schedule_button_timeout(message_ts, CHANNEL_ID, blocks)
+        # Schedule button disabling after timeout (the job carries the channel and original blocks)
+        schedule_button_timeout(message_ts, channel_id, blocks)
         
         logger.info(f"Hourly check-in reminder sent at {time_str} EST (message_ts: {message_ts})" + (f" with image" if image_url else "") + f", buttons will disable after {BUTTON_TIMEOUT_MINUTES} minutes")
     except SlackApiError as e:
         logger.error(f"Error sending reminder: {e}")
 
 
-def record_checkin(user_id: str, status: str, timestamp: datetime = None):
-    """Record a check-in to the database"""
+def record_checkin(user_id: str, status: str, timestamp: datetime = None, message_ts: str = None, status_post: Dict = None):
+    """Queue a check-in for the background writer (inserted in the next batch).
+    Returns once queued. The writer hands status_post to the status poster only after the batch
+    commits; if the write fails it releases the user's claim on message_ts and asks them to click again."""
     if timestamp is None:
         timestamp = get_est_time()
     
-    # Convert EST datetime to UTC for database storage
+    # Convert EST datetime to epoch seconds for database storage
     if timestamp.tzinfo is None:
         timestamp = EST.localize(timestamp)
-    utc_timestamp = timestamp.astimezone(pytz.UTC).replace(tzinfo=None)
+    epoch_timestamp = int(timestamp.timestamp())
     
-    session = get_db_session()
     try:
-        checkin = CheckIn(
-            user_id=user_id,
-            status=status,
-            timestamp=utc_timestamp
-        )
-        session.add(checkin)
-        session.commit()
-        logger.info(f"Recorded check-in: {user_id} - {status} at {timestamp.strftime('%Y-%m-%d %H:%M:%S %Z')}")
+        _CHECKIN_QUEUE.put({
+            "user_id": user_id,
+            "status": status,
+            "timestamp": epoch_timestamp,
+            "claim": (message_ts, status_post) if message_ts else None
+        })
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Queued check-in: %s - %s at %s", user_id, status, timestamp.strftime('%Y-%m-%d %H:%M:%S %Z'))
         return True
     except Exception as e:
-        session.rollback()
-        logger.error(f"Error recording check-in: {e}")
+        logger.error("Error queueing check-in: %s", e)
+        return False
+
+
+def claim_reminder_click(message_ts: str, user_id: str) -> bool:
+    """Record a user's click on a reminder in the DB; False if another worker already recorded it"""
+    # A synchronous commit per click, outside the check-in writer's batches: the claim has to be
+    # settled before the user is answered, and click volume is at most one per user per reminder
+    try:
+        with db_session() as session:
+            session.execute(insert(ReminderClick), {"message_ts": message_ts, "user_id": user_id})
+        return True
+    except IntegrityError:
         return False
+    except Exception as e:
+        # Fall back to the in-process guard rather than blocking check-ins
+        logger.error("Error recording reminder click: %s", e)
+        return True
+
+
+def prune_reminder_clicks():
+    """Delete recorded clicks on reminders whose check-in period is over"""
+    # is_reminder_expired rejects those clicks anyway, so the rows only matter until the timeout
+    cutoff = time.time() - BUTTON_TIMEOUT_MINUTES * 60
+    try:
+        with db_session() as session:
+            result = session.execute(
+                delete(ReminderClick).where(cast(ReminderClick.message_ts, Float) < cutoff)
+            )
+        if result.rowcount:
+            logger.debug("Pruned %s expired reminder click(s)", result.rowcount)
+    except Exception as e:
+        logger.error("Error pruning reminder clicks: %s", e)
+
+
+def release_reminder_click(message_ts: str, user_id: str):
+    """Remove a user's recorded click so they can retry after a failed check-in"""
+    try:
+        with db_session() as session:
+            session.execute(
+                delete(ReminderClick).where(ReminderClick.message_ts == message_ts, ReminderClick.user_id == user_id)
+            )
+    except Exception as e:
+        logger.error("Error releasing reminder click: %s", e)
+
+
+def release_checkin_claim(message_ts: str, user_id: str):
+    """Forget a user's click on a reminder (in process and in the DB) so they can check in again"""
+    with _CLICKED_MESSAGES_LOCK:
+        if message_ts in clicked_messages:
+            clicked_messages[message_ts].discard(user_id)
+    release_reminder_click(message_ts, user_id)
+
+
+def _release_failed_claims(rows: List[Dict], claims: List[Optional[Tuple]]):
+    """After a failed batch write, let each user whose check-in was lost click again"""
+    for row, claim in zip(rows, claims):
+        if not claim:
+            continue
+        message_ts, status_post = claim
+        release_checkin_claim(message_ts, row["user_id"])
+        if not status_post:
+            continue
+        try:
+            status_post["respond"](text="❌ Your check-in could not be saved. Please click again.", replace_original=False)
+        except Exception as e:
+            logger.warning("Could not tell %s their check-in failed: %s", row["user_id"], e)
+
+
+def _write_checkin_batch(rows: List[Dict]):
+    """Insert a batch of check-in rows with a single executemany and commit"""
+    if not rows:
+        return
+    
+    # Claims travel with the rows for failure handling only; they are not columns
+    claims = [row.pop("claim", None) for row in rows]
+    try:
+        with db_session() as session:
+            if engine.dialect.name == "sqlite":
+                # Take the write lock up front so the batch is one explicit transaction with a single commit
+                session.connection().exec_driver_sql("BEGIN IMMEDIATE")
+            session.execute(insert(CheckIn), rows)
+        # Only now is the check-in saved: post it to the channel and confirm to the user
+        for claim in claims:
+            if claim and claim[1]:
+                _STATUS_POST_QUEUE.put(claim[1])
+        logger.info("Recorded %s check-in(s) to database", len(rows))
+        
+        # Cached reports for the affected days are now stale, as is any report still being built for them
+        with _REPORT_CACHE_LOCK:
+            for est_date in {datetime.fromtimestamp(row["timestamp"], EST).date() for row in rows}:
+                _REPORT_GENERATIONS[est_date] = _REPORT_GENERATIONS.get(est_date, 0) + 1
+                _REPORT_CACHE.pop(est_date, None)
+    except IntegrityError as e:
+        logger.error("Integrity error recording %s check-in(s): %s", len(rows), e)
+        _release_failed_claims(rows, claims)
+    except Exception as e:
+        logger.error("Error recording %s check-in(s): %s", len(rows), e)
+        _release_failed_claims(rows, claims)
+
+
+def _checkin_writer():
+    """Background thread: drain queued check-ins and write them in batches"""
+    try:
+        _run_checkin_writer()
     finally:
-        session.close()
+        remove_db_session()
 
 
-def generate_daily_report(date: datetime = None) -> Dict:
-    """Generate daily report for all tracked users (EST timezone)"""
-    if date is None:
-        est_now = get_est_time()
-        date = est_now.date()
-    else:
-        # Convert to EST if needed
-        if isinstance(date, datetime):
-            date = date.date()
-        est_now = EST.localize(datetime.combine(date, datetime.min.time()))
+def _collect_batch(work_queue: queue.Queue, max_items: int, wait_seconds: float) -> Tuple[List, bool]:
+    """Block for one queued item, then gather more until max_items or wait_seconds pass.
+    Returns (items, stop) where stop means the None shutdown sentinel was seen."""
+    item = work_queue.get()
+    if item is None:
+        return [], True
+    
+    items = [item]
+    deadline = time.monotonic() + wait_seconds
+    while len(items) < max_items:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            item = work_queue.get(timeout=remaining)
+        except queue.Empty:
+            break
+        if item is None:
+            return items, True
+        items.append(item)
+    return items, False
+
+
+def _run_checkin_writer():
+    """Writer loop: write up to CHECKIN_BATCH_SIZE rows per flush window until shutdown"""
+    flush_interval = CHECKIN_FLUSH_INTERVAL_MS / 1000.0
+    while True:
+        rows, stop = _collect_batch(_CHECKIN_QUEUE, CHECKIN_BATCH_SIZE, flush_interval)
+        try:
+            _write_checkin_batch(rows)
+        except Exception as e:
+            logger.error("Unexpected error in check-in writer: %s", e)
+        
+        if stop:
+            return
+
+
+def _drain_checkin_queue():
+    """Flush any queued check-ins on shutdown"""
+    _CHECKIN_QUEUE.put(None)
+    _checkin_writer_thread.join(timeout=10)
     
-    # Convert EST date range to UTC for database query
-    est_start = EST.localize(datetime.combine(date, datetime.min.time()))
-    est_end = EST.localize(datetime.combine(date, datetime.max.time()))
-    utc_start = est_start.astimezone(pytz.UTC).replace(tzinfo=None)
-    utc_end = est_end.astimezone(pytz.UTC).replace(tzinfo=None)
+    # Write anything queued after the writer stopped
+    rows = []
+    while True:
+        try:
+            row = _CHECKIN_QUEUE.get_nowait()
+        except queue.Empty:
+            break
+        if row is not None:
+            rows.append(row)
+    _write_checkin_batch(rows)
+
+
+def _post_status_batch(items: List[Dict]):
+    """Post queued check-in statuses with one chat_postMessage per channel, then confirm to each user"""
+    by_channel = {}
+    for item in items:
+        by_channel.setdefault(item["channel_id"], []).append(item)
     
-    session = get_db_session()
-    try:
-        # Get all check-ins for the day (in UTC)
-        checkins = session.query(CheckIn).filter(
-            CheckIn.timestamp >= utc_start,
-            CheckIn.timestamp <= utc_end
-        ).order_by(CheckIn.timestamp).all()
+    for channel_id, channel_items in by_channel.items():
+        error = None
+        try:
+            slack_app.client.chat_postMessage(
+                channel=channel_id,
+                blocks=[
+                    {
+                        "type": "section",
+                        "text": {
+                            "type": "mrkdwn",
+                            "text": item["section_text"]
+                        }
+                    }
+                    for item in channel_items
+                ],
+                text="\n".join(item["fallback_text"] for item in channel_items)
+            )
+            logger.info("Posted %s check-in(s) to channel %s", len(channel_items), channel_id)
+        except SlackApiError as e:
+            logger.error("Error posting check-in to channel: %s", e)
+            error = e
         
-        # Group by user and calculate actual working time from timestamps
-        user_stats = {}
-        user_checkins = {}  # Store check-ins per user for time calculation
+        # Respond to each user (ephemeral message)
+        for item in channel_items:
+            if error:
+                text = f"{item['status_emoji']} Check-in recorded, but failed to post to channel. Error: {error}"
+            else:
+                text = f"{item['status_emoji']} Your check-in has been recorded and posted to the channel!"
+            try:
+                item["respond"](text=text, replace_original=False)
+            except Exception as e:
+                logger.error("Error confirming check-in to user: %s", e)
+
+
+def _status_poster():
+    """Background thread: send queued check-in status posts in grouped batches"""
+    post_interval = STATUS_POST_INTERVAL_MS / 1000.0
+    last_post = 0.0
+    while True:
+        items, stop = _collect_batch(_STATUS_POST_QUEUE, STATUS_POST_MAX_BATCH, post_interval)
         
-        for checkin in checkins:
-            # Convert UTC timestamp back to EST
-            utc_dt = pytz.UTC.localize(checkin.timestamp)
-            est_dt = utc_dt.astimezone(EST)
-            
-            if checkin.user_id not in user_stats:
-                user_stats[checkin.user_id] = {
-                    "user_id": checkin.user_id,
-                    "name": get_user_name(checkin.user_id),
-                    "total_minutes": 0  # Total working minutes
-                }
-                user_checkins[checkin.user_id] = []
-            
-            # Store check-in with EST timestamp
-            user_checkins[checkin.user_id].append({
-                "status": checkin.status,
-                "timestamp": est_dt
-            })
+        # Keep posts at least STATUS_POST_MIN_SPACING_SECONDS apart (Slack allows ~1 message/sec per channel);
+        # anything queued while waiting joins this batch
+        wait = last_post + STATUS_POST_MIN_SPACING_SECONDS - time.monotonic()
+        if wait > 0 and not stop:
+            time.sleep(wait)
+            while len(items) < STATUS_POST_MAX_BATCH:
+                try:
+                    item = _STATUS_POST_QUEUE.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                items.append(item)
         
-        # Calculate actual working time for each user
-        for user_id, checkin_list in user_checkins.items():
-            if not checkin_list:
-                continue
-            
-            # Sort check-ins by timestamp
-            checkin_list.sort(key=lambda x: x["timestamp"])
+        try:
+            _post_status_batch(items)
+        except Exception as e:
+            logger.error("Unexpected error in status poster: %s", e)
+        last_post = time.monotonic()
+        
+        if stop:
+            return
+
+
+def _drain_status_post_queue():
+    """Send any queued status posts on shutdown"""
+    _STATUS_POST_QUEUE.put(None)
+    _status_poster_thread.join(timeout=10)
+    
+    items = []
+    while True:
+        try:
+            item = _STATUS_POST_QUEUE.get_nowait()
+        except queue.Empty:
+            break
+        if item is not None:
+            items.append(item)
+    _post_status_batch(items)
+
+
+@functools.lru_cache(maxsize=64)
+def _est_day_bounds(date) -> Tuple[int, int]:
+    """Epoch-second bounds of an EST calendar day, half-open: [start of day, start of next day)"""
+    # Both ends are localized separately: DST-change days are 23 or 25 hours long
+    est_start = EST.localize(datetime.combine(date, DAY_START_TIME))
+    est_end = EST.localize(datetime.combine(date + timedelta(days=1), DAY_START_TIME))
+    return int(est_start.timestamp()), int(est_end.timestamp())
+
+
+def _cache_report(date, report: Dict, generation: int):
+    """Cache a report unless check-ins for its date were written after it started querying"""
+    with _REPORT_CACHE_LOCK:
+        if _REPORT_GENERATIONS.get(date, 0) == generation:
+            _REPORT_CACHE[date] = (report, time.monotonic() + REPORT_CACHE_TTL_SECONDS)
+
+
+def generate_daily_report(date: datetime = None, force: bool = False) -> Dict:
+    """Generate daily report for all tracked users (EST timezone), cached per date unless force=True"""
+    if date is None:
+        date = get_est_time().date()
+    elif isinstance(date, datetime):
+        date = date.date()
+    
+    if not force:
+        cached = _REPORT_CACHE.get(date)
+        if cached and time.monotonic() < cached[1]:
+            logger.debug(f"Serving cached report for {date}")
+            return cached[0]
+    
+    start_epoch, end_epoch = _est_day_bounds(date)
+    generation = _REPORT_GENERATIONS.get(date, 0)
+    
+    try:
+        with db_session() as session:
+            # Per-user status counts for the day, aggregated in SQL (at most 3 rows per user)
+            day_range = {"start": start_epoch, "end": end_epoch}
+            status_counts = session.execute(_DAY_STATUS_COUNTS_QUERY, day_range).all()
             
-            total_working_seconds = 0
-            working_start = None
+            # No check-ins that day: skip the name lookups and the working-time query
+            if not status_counts:
+                report = {"date": date.strftime(DATE_FORMAT), "users": {}}
+                _cache_report(date, report, generation)
+                return report
             
-            # Process check-ins chronologically
-            for i, checkin in enumerate(checkin_list):
-                status = checkin["status"]
-                timestamp = checkin["timestamp"]
-                
-                if status == "working":
-                    # If already working, close previous period and start new one
-                    if working_start is not None:
-                        # Close previous working period at this timestamp
-                        time_diff = timestamp - working_start
-                        total_working_seconds += time_diff.total_seconds()
-                    # Start new working period
-                    working_start = timestamp
-                else:
-                    # End of working period (break or away)
-                    if working_start is not None:
-                        # Calculate time worked from start to this timestamp
-                        time_diff = timestamp - working_start
-                        total_working_seconds += time_diff.total_seconds()
-                        working_start = None
+            user_stats = {}
+            report_user_ids = {user_id for user_id, _, _ in status_counts}
+            prefetch_user_names(report_user_ids)
+            # Look up any names still missing in the background while the working-time query runs
+            name_futures = {
+                user_id: _USER_LOOKUP_EXECUTOR.submit(get_user_name, user_id)
+                for user_id in report_user_ids if _cached_user_name(user_id) is None
+            }
             
-            # If still working at end of day (last check-in was "working")
-            if working_start is not None:
-                # Calculate time from last working check-in to end of day
-                # Use the last check-in timestamp as end point (conservative estimate)
-                # Or use end of day - but that might overestimate
-                # Better: use the last check-in time as end (they stopped working when they last checked in)
-                last_checkin_time = checkin_list[-1]["timestamp"]
-                if last_checkin_time > working_start:
-                    time_diff = last_checkin_time - working_start
-                    total_working_seconds += time_diff.total_seconds()
+            for user_id, status, count in status_counts:
+                if user_id not in user_stats:
+                    user_stats[user_id] = {
+                        "user_id": user_id,
+                        "name": None,  # Filled in below
+                        "total_minutes": 0,  # Total working minutes
+                        "working_count": 0,
+                        "break_count": 0,
+                        "away_count": 0
+                    }
+                count_key = f"{status}_count"
+                if count_key in user_stats[user_id]:
+                    user_stats[user_id][count_key] = count
             
+            # Calculate actual working time from timestamps - one row per user, summed in SQL
+            # A period still open at the last check-in adds nothing: the user's last known activity is its start
+            working_seconds = session.execute(_DAY_WORKING_SECONDS_QUERY, day_range).all()
+        
+        for user_id, total_working_seconds in working_seconds:
+            if user_id not in user_stats:
+                continue
             # Convert seconds to minutes (round to nearest minute)
-            total_minutes = int(round(total_working_seconds / 60))
+            total_minutes = int(round((total_working_seconds or 0) / 60))
             user_stats[user_id]["total_minutes"] = max(0, total_minutes)  # Ensure non-negative
         
         # Convert minutes to hours and minutes
         for user_id, stats in user_stats.items():
+            stats["name"] = name_futures[user_id].result() if user_id in name_futures else get_user_name(user_id)
             total_minutes = stats["total_minutes"]
             hours = total_minutes // 60
             minutes = total_minutes % 60
@@ -573,65 +1319,90 @@ def generate_daily_report(date: datetime = None) -> Dict:
             stats["minutes"] = minutes
             stats["total_minutes"] = total_minutes
         
-        return {
-            "date": date.strftime("%Y-%m-%d"),
+        report = {
+            "date": date.strftime(DATE_FORMAT),
             "users": user_stats
         }
+        _cache_report(date, report, generation)
+        return report
     except Exception as e:
         logger.error(f"Error generating report: {e}")
         return {}
+
+
+# Static report block parts shared by every report
+_DIVIDER_BLOCK = {"type": "divider"}
+_REPORT_HEADER_TEXT = "📊 Daily Report - {date} (EST)"
+_EMPTY_REPORT_TEXT = "*📊 Daily Report - {date} (EST)*\n\nNo check-ins recorded for this day."
+
+
+@functools.lru_cache(maxsize=32)
+def _empty_report_blocks(date_str: str) -> List[Dict]:
+    """Build (once per date) the block list for a report with no check-ins"""
+    return [
+        {
+            "type": "section",
+            "text": {
+                "type": "mrkdwn",
+                "text": _EMPTY_REPORT_TEXT.format(date=date_str)
+            }
+        }
+    ]
+
+
+def log_report_query_plan():
+    """Log SQLite's plan for the report day-range query (debug logging only)"""
+    if not logger.isEnabledFor(logging.DEBUG) or engine.dialect.name != "sqlite":
+        return
+    
+    connection = engine.raw_connection()
+    try:
+        compiled = _DAY_WORKING_SECONDS_QUERY.compile(dialect=engine.dialect)
+        now = int(time.time())
+        params = {**compiled.params, "start": now, "end": now}
+        cursor = connection.cursor()
+        cursor.execute(f"EXPLAIN QUERY PLAN {compiled}", [params[name] for name in compiled.positiontup])
+        for row in cursor.fetchall():
+            logger.debug(f"Report query plan: {row[-1]}")
+    except Exception as e:
+        logger.debug(f"Could not explain report query: {e}")
     finally:
-        session.close()
+        connection.close()
 
 
 def format_daily_report(report: Dict) -> List[Dict]:
     """Format daily report as Slack blocks - showing only working hours/minutes, ordered by TRACKED_USERS"""
     if not report or not report.get("users"):
-        return [
-            {
-                "type": "section",
-                "text": {
-                    "type": "mrkdwn",
-                    "text": f"*📊 Daily Report - {report.get('date', 'N/A')} (EST)*\n\nNo check-ins recorded for this day."
-                }
-            }
-        ]
+        return _empty_report_blocks(report.get("date", "N/A"))
+    
+    # A report served from _REPORT_CACHE is the same object, so its blocks can be reused as-is
+    cached = _REPORT_BLOCKS_CACHE.get(report["date"])
+    if cached and cached[0] is report:
+        return cached[1]
     
     blocks = [
         {
             "type": "header",
             "text": {
                 "type": "plain_text",
-                "text": f"📊 Daily Report - {report['date']} (EST)"
+                "text": _REPORT_HEADER_TEXT.format(date=report["date"])
             }
         },
-        {
-            "type": "divider"
-        }
+        _DIVIDER_BLOCK
     ]
     
     user_stats = report["users"]
     
     # Find min and max working times for emoji assignment
-    if user_stats:
-        min_minutes = min(stats.get("total_minutes", 0) for stats in user_stats.values())
-        max_minutes = max(stats.get("total_minutes", 0) for stats in user_stats.values())
-    else:
-        min_minutes = max_minutes = 0
+    all_minutes = [stats.get("total_minutes", 0) for stats in user_stats.values()]
+    min_minutes = min(all_minutes, default=0)
+    max_minutes = max(all_minutes, default=0)
     
     # Order users by TRACKED_USER_IDS from env, then by working time (descending)
-    ordered_users = []
-    
-    # First, add users in TRACKED_USER_IDS order
     if TRACKED_USERS:
-        for user_id in TRACKED_USERS:
-            if user_id in user_stats:
-                ordered_users.append((user_id, user_stats[user_id]))
-        
-        # Add any other users not in TRACKED_USER_IDS
-        for user_id, stats in user_stats.items():
-            if user_id not in TRACKED_USERS:
-                ordered_users.append((user_id, stats))
+        # Users in TRACKED_USER_IDS order first, then any others in report order (sorted() is stable)
+        untracked = len(TRACKED_USERS)
+        ordered_users = sorted(user_stats.items(), key=lambda x: _TRACKED_INDEX.get(x[0], untracked))
     else:
         # If no TRACKED_USER_IDS, sort by working time (descending)
         sorted_users = sorted(
@@ -664,49 +1435,65 @@ def format_daily_report(report: Dict) -> List[Dict]:
         elif total_minutes == max_minutes and max_minutes > 0:
             emoji = " 🏆"  # Congratulation emoji for most working time
         
-        user_blocks = [
+        blocks.extend((
             {
                 "type": "section",
                 "text": {
                     "type": "mrkdwn",
                     "text": f"*👤 {stats['name']}*{emoji}\n*Working Time:* {time_str}"
                 }
-            }
-        ]
-        
-        blocks.extend(user_blocks)
-        blocks.append({"type": "divider"})
+            },
+            _DIVIDER_BLOCK
+        ))
     
+    _REPORT_BLOCKS_CACHE[report["date"]] = (report, blocks)
     return blocks
 
 
 # Slack Event Handlers
 
+# Mention commands, matched in one pass; the first command word in the message wins
+_MENTION_COMMAND_RE = re.compile(r"\b(?:(?P<report>reports?|daily)|(?P<help>help))\b", re.IGNORECASE)
+
+
+def _mention_report(say):
+    """Reply to `@bot report` with today's report"""
+    report = generate_daily_report()
+    blocks = format_daily_report(report)
+    say(blocks=blocks)
+
+
+def _mention_help(say):
+    """Reply to `@bot help` with the command list"""
+    say(
+        blocks=[
+            {
+                "type": "section",
+                "text": {
+                    "type": "mrkdwn",
+                    "text": "*🤖 Time Tracking Bot Commands:*\n\n"
+                           "• `@bot report` - Show daily report\n"
+                           "• `@bot help` - Show this help message\n"
+                           "• Click buttons in hourly reminders to check in"
+                }
+            }
+        ]
+    )
+
+
+_MENTION_COMMANDS = {
+    "report": _mention_report,
+    "help": _mention_help
+}
+
+
 @slack_app.event("app_mention")
 def handle_mention(event, say):
     """Handle bot mentions"""
-    user_id = event["user"]
-    text = event.get("text", "").lower()
+    match = _MENTION_COMMAND_RE.search(event.get("text", ""))
     
-    if "report" in text or "daily" in text:
-        report = generate_daily_report()
-        blocks = format_daily_report(report)
-        say(blocks=blocks)
-    elif "help" in text:
-        say(
-            blocks=[
-                {
-                    "type": "section",
-                    "text": {
-                        "type": "mrkdwn",
-                        "text": "*🤖 Time Tracking Bot Commands:*\n\n"
-                               "• `@bot report` - Show daily report\n"
-                               "• `@bot help` - Show this help message\n"
-                               "• Click buttons in hourly reminders to check in"
-                    }
-                }
-            ]
-        )
+    if match:
+        _MENTION_COMMANDS[match.lastgroup](say)
     else:
         say("Hi! I'm your time tracking bot. Use `@bot report` to see daily reports or `@bot help` for commands.")
 
@@ -720,9 +1507,7 @@ def handle_member_left_channel(event, client):
     - For PRIVATE channels: Requires scopes: groups:read + groups:write.invites
     - For PUBLIC channels: Requires scopes: channels:read + channels:write.invites
     """
-    logger.info("=" * 60)
-    logger.info("🔔 MEMBER_LEFT_CHANNEL EVENT RECEIVED")
-    logger.info(f"Event data: {event}")
+    logger.debug("member_left_channel event: %s", event)
     
     if not AUTO_REINVITE_ENABLED:
         logger.warning("❌ Auto re-invite is DISABLED. Set AUTO_REINVITE_ENABLED=true in .env")
@@ -730,112 +1515,153 @@ def handle_member_left_channel(event, client):
 
     channel_id = event.get("channel")
     user_id = event.get("user")
+    tracked_channel = get_channel_id()
     
-    logger.info(f"📋 Processing leave event:")
-    logger.info(f"   Channel ID: {channel_id}")
-    logger.info(f"   User ID: {user_id}")
-    logger.info(f"   Configured CHANNEL_ID: {CHANNEL_ID}")
-    logger.info(f"   TRACKED_USERS: {TRACKED_USERS}")
+    logger.info("🔔 Leave event: user %s left channel %s (configured channel: %s)", user_id, channel_id, tracked_channel)
 
     if not channel_id or not user_id:
         logger.warning("⚠️ Missing channel_id or user_id in event. Ignoring.")
         return
 
+    if _is_duplicate_leave((channel_id, user_id, event.get("event_ts", ""))):
+        logger.info("ℹ️ Leave event for %s in %s was already handled. Ignoring.", user_id, channel_id)
+        return
+
     # Only enforce for our target channel
-    if CHANNEL_ID and channel_id != CHANNEL_ID:
-        logger.info(f"ℹ️ Channel {channel_id} doesn't match configured CHANNEL_ID {CHANNEL_ID}. Ignoring.")
+    if tracked_channel and channel_id != tracked_channel:
+        logger.info("ℹ️ Channel %s doesn't match configured CHANNEL_ID %s. Ignoring.", channel_id, tracked_channel)
         return
-    
-    logger.info(f"✅ Channel matches configured CHANNEL_ID")
 
     # If TRACKED_USERS is set, only enforce for those users
-    if TRACKED_USERS and user_id not in TRACKED_USERS:
-        logger.info(f"ℹ️ User {user_id} is not in TRACKED_USERS list. Ignoring.")
-        logger.info(f"   TRACKED_USERS: {TRACKED_USERS}")
+    if TRACKED_USERS and user_id not in _TRACKED_INDEX:
+        logger.info("ℹ️ User %s is not in TRACKED_USERS list. Ignoring.", user_id)
         return
-    
-    logger.info(f"✅ User {user_id} is in TRACKED_USERS list")
 
     # Don't try to invite the bot itself
     try:
         auth = client.auth_test()
         bot_user_id = auth.get("user_id")
-        logger.info(f"🤖 Bot user ID: {bot_user_id}")
         if bot_user_id and user_id == bot_user_id:
             logger.info("ℹ️ User is the bot itself. Ignoring.")
             return
     except Exception as e:
-        logger.warning(f"⚠️ Could not get bot user ID: {e}")
+        logger.warning("⚠️ Could not get bot user ID: %s", e)
 
     # Get user name for logging
     user_name = get_user_name(user_id)
-    logger.info(f"👤 User name: {user_name}")
 
-    # Small delay helps avoid race conditions right after leave
-    logger.info(f"⏳ Waiting {AUTO_REINVITE_DELAY_SECONDS} seconds before re-inviting...")
-    try:
-        if AUTO_REINVITE_DELAY_SECONDS > 0:
-            time.sleep(AUTO_REINVITE_DELAY_SECONDS)
-    except Exception as e:
-        logger.warning(f"⚠️ Error during delay: {e}")
+    # Small delay helps avoid race conditions right after leave; the invite runs later as a
+    # scheduler job so this listener thread is free for other events meanwhile
+    if AUTO_REINVITE_DELAY_SECONDS <= 0:
+        _do_reinvite(client, channel_id, user_id, user_name)
+        return
+    
+    logger.info("⏳ Re-inviting %s (%s) in %s seconds...", user_name, user_id, AUTO_REINVITE_DELAY_SECONDS)
+    if scheduler.running:
+        scheduler.add_job(
+            func=_do_reinvite,
+            trigger=DateTrigger(run_date=datetime.now(EST) + timedelta(seconds=AUTO_REINVITE_DELAY_SECONDS)),
+            args=[client, channel_id, user_id, user_name],
+            id=f"reinvite:{channel_id}:{user_id}",
+            name="Re-invite user who left the channel",
+            misfire_grace_time=60,
+            replace_existing=True
+        )
+    else:
+        # Scheduler not running in this process (RUN_SCHEDULER=false or another process holds the lock)
+        threading.Timer(AUTO_REINVITE_DELAY_SECONDS, _do_reinvite, args=[client, channel_id, user_id, user_name]).start()
+
+
+def _is_duplicate_leave(key: Tuple[str, str, str]) -> bool:
+    """Whether this leave event was seen in the last LEAVE_DEDUPE_SECONDS (records it if not)"""
+    now = time.monotonic()
+    with _SEEN_LEAVES_LOCK:
+        # Entries are in the order seen, so expired ones are all at the front
+        while _SEEN_LEAVES and now - next(iter(_SEEN_LEAVES.values())) > LEAVE_DEDUPE_SECONDS:
+            _SEEN_LEAVES.popitem(last=False)
+        if key in _SEEN_LEAVES:
+            return True
+        _SEEN_LEAVES[key] = now
+        if len(_SEEN_LEAVES) > LEAVE_DEDUPE_MAX:
+            _SEEN_LEAVES.popitem(last=False)
+        return False
 
+
+# Fix hints logged with a failed re-invite, by Slack error code
+_REINVITE_ERROR_HINTS = {
+    "not_in_channel": "Bot must be a member of the channel! Invite the bot to the channel first.",
+    "cant_invite": "Bot doesn't have permission to invite users. Check workspace settings and bot permissions."
+}
+
+
+def _do_reinvite(client, channel_id: str, user_id: str, user_name: str):
+    """Invite a user back to the channel they left"""
     # Determine if channel is private (starts with 'G') or public (starts with 'C')
     # Private channels use groups API, public channels use conversations API
-    logger.info(f"🔍 Channel type: {'PRIVATE' if channel_id.startswith('G') else 'PUBLIC'}")
+    is_private = channel_id.startswith('G')
     
     try:
-        if channel_id.startswith('G'):
+        if is_private:
             # Private channel - use groups.invite
-            logger.info(f"📤 Attempting to invite {user_name} ({user_id}) to PRIVATE channel {channel_id} using groups.invite...")
             client.groups_invite(channel=channel_id, users=user_id)
-            logger.info(f"✅ SUCCESS: Re-invited {user_name} ({user_id}) to private channel {channel_id}")
+            logger.info("✅ SUCCESS: Re-invited %s (%s) to private channel %s", user_name, user_id, channel_id)
         else:
             # Public channel - use conversations.invite or channels.invite
-            logger.info(f"📤 Attempting to invite {user_name} ({user_id}) to PUBLIC channel {channel_id}...")
             try:
                 client.conversations_invite(channel=channel_id, users=user_id)
-                logger.info(f"✅ SUCCESS: Re-invited {user_name} ({user_id}) to public channel {channel_id} (using conversations API)")
+                logger.info("✅ SUCCESS: Re-invited %s (%s) to public channel %s (using conversations API)", user_name, user_id, channel_id)
             except SlackApiError as e:
-                logger.warning(f"⚠️ conversations.invite failed: {e}, trying channels.invite...")
+                logger.warning("⚠️ conversations.invite failed: %s, trying channels.invite...", e)
                 # Fallback to channels.invite for older workspaces
                 client.channels_invite(channel=channel_id, users=user_id)
-                logger.info(f"✅ SUCCESS: Re-invited {user_name} ({user_id}) to public channel {channel_id} (using channels API)")
+                logger.info("✅ SUCCESS: Re-invited %s (%s) to public channel %s (using channels API)", user_name, user_id, channel_id)
     except SlackApiError as e:
         # Common errors: missing_scope, not_in_channel, cant_invite_self, cant_invite, already_in_channel
         error_code = e.response.get("error", "")
-        error_msg = str(e)
-        
-        logger.error("=" * 60)
-        logger.error(f"❌ FAILED to re-invite {user_name} ({user_id}) to channel {channel_id}")
-        logger.error(f"   Error code: {error_code}")
-        logger.error(f"   Error message: {error_msg}")
         
+        if error_code == "already_in_channel":
+            logger.info("ℹ️ %s (%s) is already in channel %s (may have been re-invited manually)", user_name, user_id, channel_id)
+            return
         if error_code == "missing_scope":
-            logger.error("   🔴 SOLUTION: Add required scopes:")
-            if channel_id.startswith('G'):
-                logger.error("      - groups:read")
-                logger.error("      - groups:write.invites")
-            else:
-                logger.error("      - channels:read")
-                logger.error("      - channels:write.invites")
-            logger.error("   Then REINSTALL the app to apply scopes!")
-        elif error_code == "not_in_channel":
-            logger.error("   🔴 SOLUTION: Bot must be a member of the channel!")
-            logger.error("   Invite the bot to the channel first.")
-        elif error_code == "already_in_channel":
-            logger.info("   ℹ️ User is already in channel (may have been re-invited manually)")
-        elif error_code == "cant_invite":
-            logger.error("   🔴 SOLUTION: Bot doesn't have permission to invite users.")
-            logger.error("   Check workspace settings and bot permissions.")
+            scopes = "groups:read, groups:write.invites" if is_private else "channels:read, channels:write.invites"
+            hint = f"Add required scopes ({scopes}), then REINSTALL the app to apply scopes!"
         else:
-            logger.error(f"   Unknown error. Check Slack API documentation for error code: {error_code}")
-        logger.error("=" * 60)
+            hint = _REINVITE_ERROR_HINTS.get(error_code, "Unknown error. Check Slack API documentation for this error code.")
+        logger.error(
+            "❌ FAILED to re-invite %s (%s) to channel %s: %s (%s) - 🔴 SOLUTION: %s",
+            user_name, user_id, channel_id, error_code, e, hint
+        )
     except Exception as e:
-        logger.error(f"❌ Unexpected error during re-invite: {e}")
-        import traceback
-        logger.error(f"Traceback: {traceback.format_exc()}")
-    
-    logger.info("=" * 60)
+        # logger.exception appends the traceback itself
+        logger.exception("❌ Unexpected error during re-invite: %s", e)
+
+
+def is_reminder_expired(message_ts: str) -> bool:
+    """Whether a reminder's check-in period is over (also right after a restart, when timeout jobs are lost)"""
+    # A Slack message ts is its post time in epoch seconds, so expiry needs no stored state
+    try:
+        return time.time() - float(message_ts) > BUTTON_TIMEOUT_MINUTES * 60
+    except (ValueError, TypeError):
+        return False
+
+
+# Check-in status emoji shown in channel posts and confirmations
+_STATUS_EMOJI = {
+    "working": "✅",
+    "break": "⏸️",
+    "away": "🏠"
+}
+_DEFAULT_STATUS_EMOJI = "📝"
+_STATUS_TEXT = {
+    "working": "Working",
+    "break": "On Break",
+    "away": "Away"
+}
+_ACTION_TO_STATUS = {
+    "checkin_working": "working",
+    "checkin_break": "break",
+    "checkin_away": "away"
+}
 
 
 @slack_app.action("checkin_working")
@@ -845,100 +1671,69 @@ def handle_checkin(ack, body, respond, client):
     """Handle check-in button clicks - prevent multiple clicks on same reminder"""
     user_id = body["user"]["id"]
     action_id = body["actions"][0]["action_id"]
-    status = action_id.replace("checkin_", "")
+    status = _ACTION_TO_STATUS[action_id]
     channel_id = body["channel"]["id"]
     message_ts = body["message"]["ts"]  # Get message timestamp
+    
+    # Acknowledge first: everything below (DB claim, replies) answers through respond(),
+    # so none of it counts against Slack's 3 second ack deadline
+    ack()
 
     if not TIMETRACKING_ENABLED:
-        ack()
         respond(text="⏸️ Time tracking is currently disabled by admin.", replace_original=False)
         return
     
-    # CRITICAL: Check if buttons are disabled (timeout expired) BEFORE ack()
-    if message_ts in disabled_messages:
-        ack()
+    # CRITICAL: Check if buttons are disabled (timeout expired) before recording anything
+    if is_reminder_expired(message_ts):
         respond(
             text="⏰ Check-in period has expired. Please wait for the next reminder.",
             replace_original=False
         )
         return
     
-    # CRITICAL: Check if user already clicked on this reminder message BEFORE ack()
-    if message_ts in clicked_messages and user_id in clicked_messages[message_ts]:
-        ack()
+    # CRITICAL: Check if user already clicked on this reminder message, and
+    # mark this user as having clicked it IMMEDIATELY (before processing) - atomically, so
+    # a double click handled on two listener threads can't record twice
+    with _CLICKED_MESSAGES_LOCK:
+        clicked_users = clicked_messages.setdefault(message_ts, set())
+        already_clicked = user_id in clicked_users
+        clicked_users.add(user_id)
+    # The in-process set covers this worker; the DB unique constraint covers the others
+    if not already_clicked and not claim_reminder_click(message_ts, user_id):
+        already_clicked = True
+    if already_clicked:
         respond(
             text="⚠️ You've already checked in for this reminder!",
             replace_original=False
         )
         return
     
-    # Mark this user as having clicked this message IMMEDIATELY (before processing)
-    if message_ts not in clicked_messages:
-        clicked_messages[message_ts] = {}
-    clicked_messages[message_ts][user_id] = True
-    
-    # Now acknowledge the action
-    ack()
-    
     # Get EST time
     est_timestamp = get_est_time()
-    time_str = est_timestamp.strftime("%H:%M:%S")
-    date_str = est_timestamp.strftime("%Y-%m-%d")
+    time_str, date_str = format_est_stamp(est_timestamp)
     
-    # Record check-in
-    success = record_checkin(user_id, status, est_timestamp)
+    user_name = get_user_name(user_id)
+    status_emoji = _STATUS_EMOJI.get(status, _DEFAULT_STATUS_EMOJI)
     
-    if success:
-        user_name = get_user_name(user_id)
-        status_emoji = {
-            "working": "✅",
-            "break": "⏸️",
-            "away": "🏠"
-        }.get(status, "📝")
-        
-        # Create formatted message
-        status_text = {
-            "working": "Working",
-            "break": "On Break",
-            "away": "Away"
-        }.get(status, status.title())
-        
-        # Post status to channel for everyone to see
-        try:
-            client.chat_postMessage(
-                channel=channel_id,
-                blocks=[
-                    {
-                        "type": "section",
-                        "text": {
-                            "type": "mrkdwn",
-                            "text": f"{status_emoji} *{user_name}* - *{status_text}*\n🕐 `{time_str} EST` | 📅 `{date_str}`"
-                        }
-                    }
-                ],
-                text=f"{status_emoji} {user_name} - {status_text} at {time_str} EST"
-            )
-            logger.info(f"Posted check-in to channel: {user_name} - {status_text} at {time_str} EST")
-        except SlackApiError as e:
-            logger.error(f"Error posting check-in to channel: {e}")
-            respond(
-                text=f"{status_emoji} Check-in recorded, but failed to post to channel. Error: {e}",
-                replace_original=False
-            )
-            return
-        
-        # Note: Buttons will be automatically disabled after BUTTON_TIMEOUT_MINUTES
-        # No need to disable immediately after one user clicks
-        
-        # Respond to the user (ephemeral message)
-        respond(
-            text=f"{status_emoji} Your check-in has been recorded and posted to the channel!",
-            replace_original=False
-        )
-    else:
-        # Remove from clicked_messages if recording failed (allow retry)
-        if message_ts in clicked_messages and user_id in clicked_messages[message_ts]:
-            del clicked_messages[message_ts][user_id]
+    # Create formatted message
+    status_text = _STATUS_TEXT.get(status, status.title())
+    
+    # Record check-in. The writer queues the status post once the row is committed; the poster
+    # thread then sends it to the channel (grouped with other check-ins from the same moment) and
+    # confirms to the user. A failed batch releases this claim and tells the user instead.
+    success = record_checkin(user_id, status, est_timestamp, message_ts=message_ts, status_post={
+        "channel_id": channel_id,
+        "section_text": f"{status_emoji} *{user_name}* - *{status_text}*\n🕐 `{time_str} EST` | 📅 `{date_str}`",
+        "fallback_text": f"{status_emoji} {user_name} - {status_text} at {time_str} EST",
+        "status_emoji": status_emoji,
+        "respond": respond
+    })
+    
+    # Note: Buttons will be automatically disabled after BUTTON_TIMEOUT_MINUTES
+    # No need to disable immediately after one user clicks
+    if not success:
+        # Could not even queue the check-in: allow retry
+        release_checkin_claim(message_ts, user_id)
         respond(
             text="❌ Error recording check-in. Please try again.",
             replace_original=False
@@ -949,9 +1744,12 @@ def handle_checkin(ack, body, respond, client):
 def handle_set_channel(ack, body, respond):
     """Command to set the tracking channel"""
     ack()
-    global CHANNEL_ID
-    CHANNEL_ID = body["channel_id"]
-    respond(f"✅ Channel set to: <#{CHANNEL_ID}>")
+    channel_id = body["channel_id"]
+    set_channel_id(channel_id)
+    if ENV_CHANNEL_ID and ENV_CHANNEL_ID != channel_id:
+        respond(f"✅ Channel set to: <#{channel_id}> until the next restart (SLACK_CHANNEL_ID in .env is used after restarts)")
+    else:
+        respond(f"✅ Channel set to: <#{channel_id}>")
 
 
 @slack_app.command("/daily-report")
@@ -967,7 +1765,13 @@ def handle_daily_report(ack, body, respond):
 def handle_test_reinvite(ack, body, respond):
     """Test command to check auto re-invite configuration"""
     ack()
-    
+    respond(blocks=_test_reinvite_blocks(get_channel_id()))
+
+
+# Everything but the channel is fixed at startup, so the blocks are built once per channel
+@functools.lru_cache(maxsize=8)
+def _test_reinvite_blocks(tracked_channel: str) -> List[Dict]:
+    """Build the /test-reinvite configuration report for a tracking channel"""
     blocks = [
         {
             "type": "section",
@@ -1003,13 +1807,13 @@ def handle_test_reinvite(ack, body, respond):
         })
     
     # Check channel ID
-    if CHANNEL_ID:
-        channel_type = "PRIVATE" if CHANNEL_ID.startswith('G') else "PUBLIC"
+    if tracked_channel:
+        channel_type = "PRIVATE" if tracked_channel.startswith('G') else "PUBLIC"
         status_blocks.append({
             "type": "section",
             "text": {
                 "type": "mrkdwn",
-                "text": f"✅ *Channel ID:* {CHANNEL_ID} ({channel_type})"
+                "text": f"✅ *Channel ID:* {tracked_channel} ({channel_type})"
             }
         })
     else:
@@ -1041,7 +1845,7 @@ def handle_test_reinvite(ack, body, respond):
         })
     
     # Check required scopes
-    channel_type = "PRIVATE" if CHANNEL_ID and CHANNEL_ID.startswith('G') else "PUBLIC"
+    channel_type = "PRIVATE" if tracked_channel and tracked_channel.startswith('G') else "PUBLIC"
     if channel_type == "PRIVATE":
         status_blocks.append({
             "type": "section",
@@ -1091,29 +1895,51 @@ def handle_test_reinvite(ack, body, respond):
         }
     ])
     
-    respond(blocks=blocks)
+    return blocks
 
 
 # Flask routes for Slack events
 @flask_app.route("/slack/events", methods=["POST"])
 def slack_events():
     """Handle Slack events"""
+    # A retry after an ack timeout repeats an event this app already received and is still
+    # handling; acknowledge it without dispatching. Retries for other reasons (connection
+    # failure, 5xx) may be the first delivery that got through, so those are processed.
+    if request.headers.get("X-Slack-Retry-Reason") == "http_timeout":
+        return Response(status=200, headers={"X-Slack-No-Retry": "1"})
     return handler.handle(request)
 
 
+# Last /health body as (epoch_second, json_bytes); probes within the same second reuse it
+_HEALTH_BODY_SLOT = (None, b"")
+
+
 @flask_app.route("/health", methods=["GET"])
 def health_check():
     """Health check endpoint"""
-    return {"status": "ok", "timestamp": datetime.now().isoformat()}
+    global _HEALTH_BODY_SLOT
+    second = int(time.time())
+    slot = _HEALTH_BODY_SLOT
+    if slot[0] != second:
+        now = datetime.fromtimestamp(second)
+        slot = (second, json.dumps({"status": "ok", "timestamp": now.isoformat()}).encode())
+        _HEALTH_BODY_SLOT = slot
+    return Response(slot[1], mimetype="application/json")
 
 
 @flask_app.route("/debug/reinvite", methods=["GET"])
 def debug_reinvite():
     """Debug endpoint to check auto re-invite configuration"""
-    return {
+    return Response(_debug_reinvite_body(get_channel_id()), mimetype="application/json")
+
+
+@functools.lru_cache(maxsize=8)
+def _debug_reinvite_body(tracked_channel: str) -> bytes:
+    """Serialize the /debug/reinvite payload once per tracking channel"""
+    return json.dumps({
         "auto_reinvite_enabled": AUTO_REINVITE_ENABLED,
-        "channel_id": CHANNEL_ID,
-        "channel_type": "PRIVATE" if CHANNEL_ID and CHANNEL_ID.startswith('G') else "PUBLIC" if CHANNEL_ID else "NOT SET",
+        "channel_id": tracked_channel,
+        "channel_type": "PRIVATE" if tracked_channel and tracked_channel.startswith('G') else "PUBLIC" if tracked_channel else "NOT SET",
         "tracked_users": TRACKED_USERS,
         "tracked_users_count": len(TRACKED_USERS) if TRACKED_USERS else 0,
         "reinvite_delay_seconds": AUTO_REINVITE_DELAY_SECONDS,
@@ -1122,100 +1948,228 @@ def debug_reinvite():
             "PUBLIC": ["channels:read", "channels:write.invites"]
         },
         "required_event": "member_left_channel"
+    }).encode()
+
+
+@flask_app.route("/debug/memory", methods=["GET"])
+def debug_memory():
+    """Debug endpoint for tracking down memory growth (needs DEBUG_TOKEN)"""
+    if not DEBUG_TOKEN or not hmac.compare_digest(request.headers.get("X-Debug-Token", ""), DEBUG_TOKEN):
+        return {"error": "Not found"}, 404
+    
+    type_counts = Counter(type(obj).__name__ for obj in gc.get_objects())
+    payload = {
+        "gc_counts": gc.get_count(),
+        "gc_stats": gc.get_stats(),
+        "top_types": type_counts.most_common(20),
+        "app_state": {
+            "clicked_messages": len(clicked_messages),
+            "user_name_cache": len(_USER_NAME_CACHE),
+            "report_cache": len(_REPORT_CACHE),
+            "image_cache": len(_IMAGE_CACHE),
+            "image_pool": len(_IMAGE_POOL),
+            "checkin_queue": _CHECKIN_QUEUE.qsize(),
+            "status_post_queue": _STATUS_POST_QUEUE.qsize(),
+            "scheduled_jobs": len(scheduler.get_jobs())
+        }
     }
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        payload["traced_memory_kib"] = {"current": current // 1024, "peak": peak // 1024}
+        payload["top_allocations"] = [
+            {"location": str(stat.traceback[0]), "size_kib": round(stat.size / 1024, 1), "count": stat.count}
+            for stat in tracemalloc.take_snapshot().statistics("lineno")[:20]
+        ]
+    else:
+        payload["top_allocations"] = "tracemalloc is off (set TRACEMALLOC_FRAMES, e.g. 25)"
+    return payload
+
+
+IMAGE_CACHE_MAX_AGE_SECONDS = 31536000  # One year
+
+# Behind nginx, hand image bytes to an internal location (sendfile) instead of streaming them from Python
+IMAGES_ACCEL_REDIRECT_PREFIX = os.environ.get("IMAGES_ACCEL_REDIRECT_PREFIX", "").strip()
+if IMAGES_ACCEL_REDIRECT_PREFIX and not IMAGES_ACCEL_REDIRECT_PREFIX.endswith("/"):
+    IMAGES_ACCEL_REDIRECT_PREFIX += "/"
 
 
 @flask_app.route("/images/<filename>", methods=["GET"])
 def serve_image(filename):
     """Serve images from local folder"""
     try:
-        return send_from_directory(IMAGES_DIR, filename)
+        # Generated images get a fresh UUID filename and never change, so let Slack's image proxy keep them
+        if IMAGES_ACCEL_REDIRECT_PREFIX:
+            image_path = safe_join(str(IMAGES_DIR), filename)
+            if not image_path or not os.path.isfile(image_path):
+                return {"error": "Image not found"}, 404
+            response = Response(mimetype=mimetypes.guess_type(filename)[0] or "application/octet-stream")
+            response.headers["X-Accel-Redirect"] = IMAGES_ACCEL_REDIRECT_PREFIX + filename
+            response.cache_control.max_age = IMAGE_CACHE_MAX_AGE_SECONDS
+        else:
+            response = send_from_directory(IMAGES_DIR, filename, max_age=IMAGE_CACHE_MAX_AGE_SECONDS)
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+        return response
     except Exception as e:
         logger.error(f"Error serving image {filename}: {e}")
         return {"error": "Image not found"}, 404
 
 
 # Scheduler setup
-scheduler = BackgroundScheduler()
+# "default" runs reminders and button timeouts; "io" keeps the slower daily report off that pool.
+# coalesce collapses missed runs into one instead of firing them back-to-back.
+scheduler = BackgroundScheduler(
+    executors={
+        "default": ThreadPoolExecutor(20),
+        "io": ThreadPoolExecutor(4)
+    },
+    job_defaults={
+        "coalesce": True,
+        "max_instances": 1,
+        "misfire_grace_time": 30
+    }
+)
 
 # Schedule reminders (configurable via environment variables)
 # Support for: minutes, hours, or specific times
 # Option 1: Use REMINDER_INTERVAL_MINUTES for minute-based intervals (recommended for < 1 hour)
 # Option 2: Use REMINDER_INTERVAL_HOURS for hour-based intervals
 
-try:
-    # Check if REMINDER_INTERVAL_MINUTES is set (takes priority for minute-level control)
-    reminder_interval_minutes = os.environ.get("REMINDER_INTERVAL_MINUTES")
-    if reminder_interval_minutes:
-        REMINDER_INTERVAL_MINUTES = int(reminder_interval_minutes)
-        if REMINDER_INTERVAL_MINUTES <= 0:
-            logger.warning(f"Invalid REMINDER_INTERVAL_MINUTES ({REMINDER_INTERVAL_MINUTES}), using default: every 1 hour")
-            REMINDER_INTERVAL_MINUTES = None
-    else:
-        REMINDER_INTERVAL_MINUTES = None
-except (ValueError, TypeError):
-    logger.warning("Invalid REMINDER_INTERVAL_MINUTES, ignoring")
-    REMINDER_INTERVAL_MINUTES = None
-
-# If REMINDER_INTERVAL_MINUTES is set, use it; otherwise use REMINDER_INTERVAL_HOURS
-if REMINDER_INTERVAL_MINUTES:
-    # Minute-based interval (e.g., every 1 minute, every 5 minutes, every 30 minutes) - EST timezone
-    if REMINDER_INTERVAL_MINUTES == 1:
-        trigger = CronTrigger(minute="*", timezone=EST)  # Every minute in EST
-        schedule_desc = "every 1 minute (EST)"
-    else:
-        trigger = CronTrigger(minute=f"*/{REMINDER_INTERVAL_MINUTES}", timezone=EST)
-        schedule_desc = f"every {REMINDER_INTERVAL_MINUTES} minutes (EST)"
-else:
-    # Hour-based interval (original behavior) - EST timezone
+def _parse_number(env: Mapping, key: str, default, cast=int):
+    """Parse a numeric setting from env, falling back to default if it is missing or invalid"""
+    raw = env.get(key)
+    if raw is None or raw == "":
+        return default
     try:
-        REMINDER_MINUTE = int(os.environ.get("REMINDER_MINUTE", "0"))
-        if REMINDER_MINUTE < 0 or REMINDER_MINUTE > 59:
-            logger.warning(f"Invalid REMINDER_MINUTE ({REMINDER_MINUTE}), using default 0")
-            REMINDER_MINUTE = 0
+        return cast(raw)
     except (ValueError, TypeError):
-        logger.warning("Invalid REMINDER_MINUTE, using default 0")
-        REMINDER_MINUTE = 0
+        logger.warning(f"Invalid {key} ({raw}), using default {default}")
+        return default
+
+
+def build_reminder_trigger(env: Mapping) -> Tuple[BaseTrigger, str]:
+    """Build the reminder trigger and its description from REMINDER_* settings"""
+    # REMINDER_INTERVAL_MINUTES takes priority for minute-level control
+    interval_minutes = _parse_number(env, "REMINDER_INTERVAL_MINUTES", None)
+    if interval_minutes is not None and interval_minutes <= 0:
+        logger.warning(f"Invalid REMINDER_INTERVAL_MINUTES ({interval_minutes}), using default: every 1 hour")
+        interval_minutes = None
+
+    reminder_minute = _parse_number(env, "REMINDER_MINUTE", 0)
+    if reminder_minute < 0 or reminder_minute > 59:
+        logger.warning(f"Invalid REMINDER_MINUTE ({reminder_minute}), using default 0")
+        reminder_minute = 0
+
+    interval_hours = _parse_number(env, "REMINDER_INTERVAL_HOURS", 1, cast=float)
+    if interval_hours <= 0:
+        logger.warning(f"Invalid REMINDER_INTERVAL_HOURS ({interval_hours}), using default 1")
+        interval_hours = 1
+
+    # Optional active window: cron-style hour range and weekdays; reminders don't fire outside it
+    active_hours = env.get("REMINDER_ACTIVE_HOURS", "").strip() or None
+    active_days = env.get("REMINDER_ACTIVE_DAYS", "").strip().lower() or None
+    if active_hours:
+        try:
+            CronTrigger(hour=active_hours, timezone=EST)
+        except ValueError:
+            logger.warning(f"Invalid REMINDER_ACTIVE_HOURS ({active_hours}), reminders will run all day")
+            active_hours = None
+    if active_days:
+        try:
+            CronTrigger(day_of_week=active_days, timezone=EST)
+        except ValueError:
+            logger.warning(f"Invalid REMINDER_ACTIVE_DAYS ({active_days}), reminders will run every day")
+            active_days = None
 
-    try:
-        REMINDER_INTERVAL_HOURS = float(os.environ.get("REMINDER_INTERVAL_HOURS", "1"))
-        if REMINDER_INTERVAL_HOURS <= 0:
-            logger.warning(f"Invalid REMINDER_INTERVAL_HOURS ({REMINDER_INTERVAL_HOURS}), using default 1")
-            REMINDER_INTERVAL_HOURS = 1
-    except (ValueError, TypeError):
-        logger.warning("Invalid REMINDER_INTERVAL_HOURS, using default 1")
-        REMINDER_INTERVAL_HOURS = 1
+    return _reminder_trigger_for(interval_minutes, reminder_minute, interval_hours, active_hours, active_days)
 
-    # Create trigger based on hour interval (EST timezone)
+
+def _expand_cron_hours(active_hours: str) -> List[int]:
+    """Expand a cron hour expression (e.g. "9-12,13-17" or "8-18/2") into its sorted hours"""
+    hours = set()
+    for item in active_hours.split(","):
+        span, _, step = item.strip().partition("/")
+        if span == "*":
+            first, last = 0, 23
+        else:
+            first, _, last = span.partition("-")
+            first = int(first)
+            last = int(last) if last else (23 if step else first)
+        hours.update(range(first, last + 1, int(step) if step else 1))
+    return sorted(hours)
+
+
+def _reminder_trigger_for(
+    interval_minutes: Optional[int],
+    reminder_minute: int,
+    interval_hours: float,
+    active_hours: Optional[str] = None,
+    active_days: Optional[str] = None
+) -> Tuple[BaseTrigger, str]:
+    """Create the reminder trigger for already-validated settings (a new trigger on every call)"""
+    hour = active_hours or "*"
+    window_desc = ""
+    if active_hours:
+        window_desc += f", hours {active_hours}"
+    if active_days:
+        window_desc += f", days {active_days}"
+    
+    # If REMINDER_INTERVAL_MINUTES is set, use it; otherwise use REMINDER_INTERVAL_HOURS
+    if interval_minutes:
+        # Minute-based interval (e.g., every 1 minute, every 5 minutes, every 30 minutes) - EST timezone
+        if not active_hours and not active_days and 60 % interval_minutes == 0:
+            # Plain fixed interval: an IntervalTrigger started on the hour fires on the same
+            # :00/:N/:2N marks as the cron form without evaluating cron fields on every run
+            start = get_est_time().replace(minute=0, second=0, microsecond=0)
+            return (
+                IntervalTrigger(minutes=interval_minutes, start_date=start, timezone=EST),
+                f"every {interval_minutes} minute{'s' if interval_minutes > 1 else ''} (EST)"
+            )
+        if interval_minutes == 1:
+            return (
+                CronTrigger(minute="*", hour=hour, day_of_week=active_days, timezone=EST),
+                f"every 1 minute{window_desc} (EST)"
+            )
+        return (
+            CronTrigger(minute=f"*/{interval_minutes}", hour=hour, day_of_week=active_days, timezone=EST),
+            f"every {interval_minutes} minutes{window_desc} (EST)"
+        )
+
+    # Hour-based interval (original behavior) - EST timezone
     try:
-        if REMINDER_INTERVAL_HOURS == 1:
+        if interval_hours == 1:
             # Every hour at specific minute (e.g., every hour at :00, :15, :30)
-            trigger = CronTrigger(minute=REMINDER_MINUTE, timezone=EST)
-            schedule_desc = f"every hour at minute {REMINDER_MINUTE} (EST)"
-        elif REMINDER_INTERVAL_HOURS < 1:
+            return (
+                CronTrigger(minute=reminder_minute, hour=hour, day_of_week=active_days, timezone=EST),
+                f"every hour at minute {reminder_minute}{window_desc} (EST)"
+            )
+        if interval_hours < 1:
             # Less than 1 hour (e.g., every 30 minutes = 0.5 hours)
-            minutes_interval = int(REMINDER_INTERVAL_HOURS * 60)
+            minutes_interval = int(interval_hours * 60)
             if minutes_interval <= 0:
                 logger.warning(f"Calculated minutes_interval ({minutes_interval}) is invalid, using default: every hour at :00")
-                trigger = CronTrigger(minute=0, timezone=EST)
-                schedule_desc = "every hour at minute 0 (EST)"
-            else:
-                trigger = CronTrigger(minute=f"*/{minutes_interval}", timezone=EST)
-                schedule_desc = f"every {minutes_interval} minutes (EST)"
-        else:
-            # Multiple hours (e.g., every 2 hours, every 4 hours)
-            hours_interval = int(REMINDER_INTERVAL_HOURS)
-            if hours_interval <= 0:
-                logger.warning(f"Calculated hours_interval ({hours_interval}) is invalid, using default: every hour at :00")
-                trigger = CronTrigger(minute=REMINDER_MINUTE, timezone=EST)
-                schedule_desc = f"every hour at minute {REMINDER_MINUTE} (EST)"
-            else:
-                trigger = CronTrigger(minute=REMINDER_MINUTE, hour=f"*/{hours_interval}", timezone=EST)
-                schedule_desc = f"every {hours_interval} hour(s) at minute {REMINDER_MINUTE} (EST)"
+                return CronTrigger(minute=0, timezone=EST), "every hour at minute 0 (EST)"
+            return (
+                CronTrigger(minute=f"*/{minutes_interval}", hour=hour, day_of_week=active_days, timezone=EST),
+                f"every {minutes_interval} minutes{window_desc} (EST)"
+            )
+        # Multiple hours (e.g., every 2 hours, every 4 hours), stepping through the active hour range
+        hours_interval = int(interval_hours)
+        step_hour = f"*/{hours_interval}"
+        if active_hours:
+            # Cron binds "/N" to the last list item only ("9-12,13-17/2" steps just 13-17),
+            # so step through the whole expanded window and pass the hours explicitly
+            step_hour = ",".join(str(h) for h in _expand_cron_hours(active_hours)[::hours_interval])
+        return (
+            CronTrigger(minute=reminder_minute, hour=step_hour, day_of_week=active_days, timezone=EST),
+            f"every {hours_interval} hour(s) at minute {reminder_minute}{window_desc} (EST)"
+        )
     except Exception as e:
         logger.error(f"Error creating CronTrigger: {e}. Using default: every hour at :00")
-        trigger = CronTrigger(minute=0, timezone=EST)
-        schedule_desc = "every hour at minute 0 (EST)"
+        return CronTrigger(minute=0, timezone=EST), "every hour at minute 0 (EST)"
+
+
+trigger, schedule_desc = build_reminder_trigger(os.environ)
 
 scheduler.add_job(
     func=send_hourly_checkin_reminder,
@@ -1226,20 +2180,31 @@ scheduler.add_job(
 )
 logger.info(f"Hourly reminders scheduled: {schedule_desc}")
 
+# Fill the reminder image pool as soon as the scheduler starts
+if IMAGE_ENABLED and OPENAI_API_KEY:
+    scheduler.add_job(
+        func=_refill_image_pool,
+        id="image_pool_refill",
+        name="Refill reminder image pool",
+        executor="io",
+        replace_existing=True
+    )
+
 # Schedule daily report (every day at 6 PM EST)
 def send_daily_report():
     """Send daily report to channel"""
     if not TIMETRACKING_ENABLED:
         logger.debug("Time tracking disabled (TIMETRACKING_ENABLED=false). Skipping daily report.")
         return
-    if not CHANNEL_ID:
+    channel_id = get_channel_id()
+    if not channel_id:
         logger.warning("Channel ID not set. Skipping daily report.")
         return
     try:
-        report = generate_daily_report()
+        report = generate_daily_report(force=True)
         blocks = format_daily_report(report)
         slack_app.client.chat_postMessage(
-            channel=CHANNEL_ID,
+            channel=channel_id,
             blocks=blocks,
             text="Daily Report"
         )
@@ -1248,16 +2213,86 @@ def send_daily_report():
         logger.error(f"Error sending daily report: {e}")
 
 # Schedule daily report at 6 PM EST
+# Refresh the user name cache from users.list so reports rarely fall back to users.info
+scheduler.add_job(
+    func=prewarm_user_cache,
+    trigger="interval",
+    hours=USER_DIRECTORY_REFRESH_HOURS,
+    id="user_directory_refresh",
+    name="Refresh user name cache",
+    executor="io",
+    replace_existing=True
+)
+
 scheduler.add_job(
     func=send_daily_report,
     trigger=CronTrigger(hour=18, minute=0, timezone=EST),  # 6 PM EST daily
     id="daily_report",
     name="Send daily report",
+    executor="io",
+    misfire_grace_time=300,  # A late report is still useful; a late reminder is not
     replace_existing=True
 )
 
-scheduler.start()
-logger.info("Scheduler started - hourly reminders and daily reports configured")
+
+def _shutdown_scheduler():
+    """Stop the scheduler on exit, letting running jobs finish"""
+    if scheduler.running:
+        scheduler.shutdown(wait=True)
+        logger.info("Scheduler stopped")
+
+
+# Warm user name cache
+prewarm_user_cache()
+
+# Confirm the report query uses the covering index (debug only)
+log_report_query_plan()
+
+# Start background check-in writer
+_checkin_writer_thread = threading.Thread(target=_checkin_writer, name="checkin-writer", daemon=True)
+_checkin_writer_thread.start()
+
+# Start background status poster
+_status_poster_thread = threading.Thread(target=_status_poster, name="status-poster", daemon=True)
+_status_poster_thread.start()
+atexit.register(_drain_status_post_queue)
+# Registered after the poster's drain so it runs first: the last committed batch queues its status posts
+atexit.register(_drain_checkin_queue)
+
+def _acquire_scheduler_lock() -> bool:
+    """Take the exclusive scheduler lock without blocking; False if another process holds it"""
+    global _SCHEDULER_LOCK_HANDLE
+    if fcntl is None:
+        return True
+    try:
+        handle = open(SCHEDULER_LOCK_FILE, "a")
+    except OSError as e:
+        logger.warning(f"Could not open scheduler lock file {SCHEDULER_LOCK_FILE} ({e}), running scheduler anyway")
+        return True
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return False
+    _SCHEDULER_LOCK_HANDLE = handle
+    return True
+
+
+if not RUN_SCHEDULER:
+    logger.info("Scheduler disabled (RUN_SCHEDULER=false) - another process sends reminders and reports")
+elif not _acquire_scheduler_lock():
+    logger.info(f"Scheduler not started - another process holds {SCHEDULER_LOCK_FILE} and sends reminders and reports")
+else:
+    scheduler.start()
+    # Registered after the queue drains so it runs before them: running jobs finish
+    # (and queue their writes/posts) before the queues are flushed
+    atexit.register(_shutdown_scheduler)
+    logger.info("Scheduler started - hourly reminders and daily reports configured")
+    # Show the resolved schedule right away so a misconfigured trigger is visible at startup
+    for job_id in ("hourly_reminder", "daily_report"):
+        job = scheduler.get_job(job_id)
+        if job and job.next_run_time:
+            logger.info(f"Next run of {job.name}: {job.next_run_time.astimezone(EST).strftime('%Y-%m-%d %H:%M:%S %Z')}")
 
 # Log configuration on startup
 logger.info("=" * 60)
@@ -1266,6 +2301,7 @@ logger.info("=" * 60)
 logger.info(f"Time Tracking Enabled: {TIMETRACKING_ENABLED}")
 logger.info(f"Channel ID: {CHANNEL_ID} ({'PRIVATE' if CHANNEL_ID and CHANNEL_ID.startswith('G') else 'PUBLIC' if CHANNEL_ID else 'NOT SET'})")
 logger.info(f"Tracked Users: {len(TRACKED_USERS) if TRACKED_USERS else 'ALL'} ({TRACKED_USERS if TRACKED_USERS else 'All users in channel'})")
+logger.info(f"Run Scheduler: {RUN_SCHEDULER} (running in this process: {scheduler.running})")
 logger.info(f"Auto Re-invite Enabled: {AUTO_REINVITE_ENABLED}")
 if AUTO_REINVITE_ENABLED:
     logger.info(f"  Re-invite Delay: {AUTO_REINVITE_DELAY_SECONDS} seconds")
@@ -1276,10 +2312,16 @@ if AUTO_REINVITE_ENABLED:
         logger.info(f"  Required Event: member_left_channel")
 logger.info(f"Button Timeout: {BUTTON_TIMEOUT_MINUTES} minutes")
 logger.info(f"Image Generation: {IMAGE_ENABLED}")
+if IMAGE_ENABLED:
+    logger.info(f"  Image Pool Size: {IMAGE_POOL_SIZE}")
+    logger.info(f"  Image Every N Reminders: {IMAGE_EVERY_N_REMINDERS}")
 logger.info("=" * 60)
 
 
 if __name__ == "__main__":
+    # SIGTERM normally skips atexit; exit cleanly so the scheduler and queues shut down.
+    # Only when run directly - under a WSGI server the server owns signal handling.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
     port = int(os.environ.get("PORT", 3000))
-    flask_app.run(host="0.0.0.0", port=port, debug=False)
+    flask_app.run(host="0.0.0.0", port=port, debug=False, threaded=True)
 
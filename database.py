@@ -3,10 +3,12 @@ Database models and session management for time tracking
 """
 
 import os
+import time
+from contextlib import contextmanager
 from datetime import datetime
-from sqlalchemy import create_engine, Column, String, DateTime, Integer
+from sqlalchemy import create_engine, event, Column, String, DateTime, Integer, BigInteger, Index, UniqueConstraint
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.orm import sessionmaker, scoped_session, Session
 
 Base = declarative_base()
 
@@ -14,11 +16,34 @@ Base = declarative_base()
 DB_PATH = os.environ.get("DB_PATH", "time_tracking.db")
 DATABASE_URL = f"sqlite:///{DB_PATH}"
 
-# Create engine
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+# Create engine (query_cache_size keeps compiled statements for the app's few repeated query shapes)
+engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    query_cache_size=1200
+)
+
+
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Tune each new SQLite connection: WAL lets report reads run alongside check-in writes"""
+    if engine.dialect.name != "sqlite":
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")  # With WAL: durable across app crashes, fsync at checkpoints
+    cursor.execute("PRAGMA mmap_size=268435456")  # 256 MiB
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA cache_size=-20000")  # ~20 MB page cache
+    cursor.close()
+
 
 # Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False skips reloading attributes of objects touched after a commit
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+# Thread-local session registry: each worker thread reuses its own Session across calls
+ScopedSession = scoped_session(SessionLocal)
 
 
 class CheckIn(Base):
@@ -28,12 +53,46 @@ class CheckIn(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(String, index=True, nullable=False)
     status = Column(String, nullable=False)  # working, break, away
-    timestamp = Column(DateTime, default=datetime.now, nullable=False, index=True)
+    timestamp = Column(BigInteger, default=lambda: int(time.time()), nullable=False)  # Unix epoch seconds (UTC)
+    
+    # Covering index for the daily report: day-range scan on timestamp, grouped by user_id/status
+    # Its leading timestamp column also serves any timestamp-only lookup, so timestamp has no index of its own
+    __table_args__ = (
+        Index("ix_checkin_ts_user_status", "timestamp", "user_id", "status"),
+    )
     
     def __repr__(self):
         return f"<CheckIn(user_id={self.user_id}, status={self.status}, timestamp={self.timestamp})>"
 
 
+class ReminderClick(Base):
+    """Model for recording which users already checked in on a reminder message"""
+    __tablename__ = "reminder_clicks"
+    
+    id = Column(Integer, primary_key=True)
+    message_ts = Column(String, nullable=False)
+    user_id = Column(String, nullable=False)
+    
+    # One click per user per reminder, enforced by the database across all worker processes
+    __table_args__ = (
+        UniqueConstraint("message_ts", "user_id", name="uq_reminder_click"),
+    )
+    
+    def __repr__(self):
+        return f"<ReminderClick(message_ts={self.message_ts}, user_id={self.user_id})>"
+
+
+class BotSetting(Base):
+    """Model for settings changed at runtime via slash commands (e.g. /set-channel)"""
+    __tablename__ = "bot_settings"
+    
+    key = Column(String, primary_key=True)
+    value = Column(String, nullable=False)
+    
+    def __repr__(self):
+        return f"<BotSetting(key={self.key}, value={self.value})>"
+
+
 class DailyReport(Base):
     """Model for storing daily report summaries"""
     __tablename__ = "daily_reports"
@@ -54,9 +113,40 @@ class DailyReport(Base):
 def init_db():
     """Initialize database tables"""
     Base.metadata.create_all(bind=engine)
+    # Older databases stored check-in timestamps as naive UTC datetime text; convert them to epoch seconds
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "UPDATE checkins SET timestamp = CAST(strftime('%s', timestamp) AS INTEGER) "
+            "WHERE typeof(timestamp) = 'text'"
+        )
+    # create_all skips existing tables, so add indexes introduced after the table was created
+    for index in CheckIn.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+    # Single-column timestamp index from older schemas duplicates the covering index's prefix
+    with engine.begin() as connection:
+        connection.exec_driver_sql("DROP INDEX IF EXISTS ix_checkins_timestamp")
 
 
 def get_db_session() -> Session:
-    """Get database session"""
-    return SessionLocal()
+    """Get the current thread's database session (close() releases its connection for reuse)"""
+    return ScopedSession()
+
+
+@contextmanager
+def db_session():
+    """Database session for a with block: commits on success, rolls back on error, always closes"""
+    session = ScopedSession()
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def remove_db_session():
+    """Discard the current thread's database session"""
+    ScopedSession.remove()
 
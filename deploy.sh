@@ -53,7 +53,7 @@ Type=simple
 User=$USER
 WorkingDirectory=$PROJECT_DIR
 Environment="PATH=$PROJECT_DIR/venv/bin"
-ExecStart=$PROJECT_DIR/venv/bin/python $PROJECT_DIR/app.py
+ExecStart=$PROJECT_DIR/venv/bin/gunicorn -k gthread -w 1 --threads 32 --keep-alive 5 -b 0.0.0.0:3000 app:flask_app
 Restart=always
 RestartSec=10
 